@@ -0,0 +1,121 @@
+""" Terminal output per frame: bytes and write calls that reach the terminal.
+
+Each case runs ct_clock in a pseudo terminal.  Write calls and bytes come
+from the syscw and wchar counters in /proc/<pid>/io, so this runs on Linux.
+Run from the repository root:  python benchmarks/output_bench.py
+"""
+import argparse
+import fcntl
+import os
+import select
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import termios
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name: (ct_clock arguments, (columns, rows), frames per second)
+CASES = {
+    "clock": (["--test_mode"], (100, 26), 1),
+    "clock date": (["--test_mode", "--show_date", "-b"], (100, 26), 1),
+    "stop watch 1/100": (["--test_mode", "stop_watch", "--auto_start",
+                          "--precision", "2"], (100, 26), 100),
+    "clock ansi": (["--ansi", "--test_mode"], (100, 26), 1),
+    "stop watch ansi": (["--ansi", "--test_mode", "stop_watch", "--auto_start",
+                         "--precision", "2"], (100, 26), 100),
+    "dashboard 4": (["--test_mode", "dashboard", "UTC", "Asia/Tokyo",
+                     "Europe/London", "America/New_York"], (200, 50), 1),
+}
+
+
+def write_counters(pid: int) -> tuple:
+    counters = {}
+    with open(f"/proc/{pid}/io") as f:
+        for line in f:
+            name, value = line.split(":")
+            counters[name] = int(value)
+    return counters["wchar"], counters["syscw"]
+
+
+def run_case(argv: list, size: tuple, seconds: float, warmup: float) -> tuple:
+    columns, rows = size
+    master, slave = os.openpty()
+    fcntl.ioctl(slave, termios.TIOCSWINSZ, struct.pack("HHHH", rows, columns, 0, 0))
+    env = dict(os.environ, TERM="xterm-256color")
+    process = subprocess.Popen([sys.executable, "ct_clock.py"] + argv, cwd=ROOT,
+                               stdin=slave, stdout=slave, stderr=slave, env=env)
+    os.close(slave)
+    start = time.monotonic() + warmup  # the first frame paints everything
+    end = start + seconds
+    counters = None
+    while True:
+        now = time.monotonic()
+        if counters is None and now >= start:
+            counters = write_counters(process.pid)
+        if now >= end:
+            break
+        # keep reading so ct_clock never blocks on a full terminal
+        if select.select([master], [], [], min(end, start) - now
+                         if now < start else end - now)[0]:
+            os.read(master, 65536)
+    written, writes = write_counters(process.pid)
+    os.write(master, b"q")
+    process.wait(timeout=5)
+    os.close(master)
+    return written - counters[0], writes - counters[1]
+
+
+def run_server_case(seconds: float, warmup: float) -> tuple:
+    # One viewer of ct-clock serve.  Socket sends do not show in
+    # /proc/<pid>/io, so they are counted by the viewer, one recv per send.
+    path = os.path.join(tempfile.mkdtemp(), "ct_clock.sock")
+    process = subprocess.Popen([sys.executable, "ct_clock.py", "--test_mode",
+                                "serve", "--socket", path], cwd=ROOT)
+    while not os.path.exists(path):
+        time.sleep(0.05)
+    viewer = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    viewer.connect(path)
+    viewer.sendall(b"26 100\n")
+    start = time.monotonic() + warmup
+    end = start + seconds
+    written = writes = 0
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        if select.select([viewer], [], [], end - now)[0]:
+            data = viewer.recv(65536)
+            if time.monotonic() >= start:
+                written += len(data)
+                writes += 1
+    viewer.close()
+    process.terminate()
+    process.wait(timeout=5)
+    return written, writes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5,
+                        help="measured seconds per case")
+    parser.add_argument("--warmup", type=float, default=1.5,
+                        help="seconds to skip at the start of each case")
+    args = parser.parse_args()
+    print(f"{'case':<18}{'frames':>8}{'bytes/frame':>13}{'writes/frame':>14}")
+    for name, (argv, size, rate) in CASES.items():
+        written, writes = run_case(argv, size, args.seconds, args.warmup)
+        frames = args.seconds * rate
+        print(f"{name:<18}{frames:>8.0f}{written / frames:>13.1f}"
+              f"{writes / frames:>14.2f}")
+    written, writes = run_server_case(args.seconds, args.warmup)
+    print(f"{'serve, 1 viewer':<18}{args.seconds:>8.0f}{written / args.seconds:>13.1f}"
+          f"{writes / args.seconds:>14.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
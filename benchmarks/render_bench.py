@@ -0,0 +1,90 @@
+""" Frame benchmarks for display() on the headless MemoryScreen backend.
+
+Run from the repository root:  python benchmarks/render_bench.py
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ct_clock  # noqa: E402
+
+# terminal (width, height) used for each size class, scaled is --scale on a wall screen
+TERMINAL_SIZES = {"small": (40, 12), "medium": (60, 16), "large": (100, 26),
+                  "scaled": (400, 100)}
+
+
+def time_strings(frames: int) -> list:
+    # consecutive seconds from 11:59:00, like a running 12 hour clock
+    strings = []
+    start = 11 * 3600 + 59 * 60
+    for i in range(frames):
+        t = (start + i) % 86400
+        hour = t // 3600 % 12 or 12
+        strings.append(f"{hour:02d}{t // 60 % 60:02d}{t % 60:02d}")
+    return strings
+
+
+def bench_display(size: str, show_seconds: bool, show_date: bool,
+                  am_pm: bool, frames: int, glyphs: str = "digits") -> dict:
+    width, height = TERMINAL_SIZES[size]
+    if size == "scaled":
+        size = ct_clock.get_text_size(width, height, scale=True)
+    screen = ct_clock.MemoryScreen(height, width)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    strings = time_strings(frames + 1)
+
+    def draw(time_string: str) -> None:
+        ct_clock.display(screen, time_string, size, width, height, "white",
+                         show_seconds, "PM" if am_pm else "", show_date, True,
+                         False, False, "01/01/2020", "black", False, "",
+                         renderer, glyphs=glyphs)
+
+    draw(strings[0])  # first frame paints the background
+    screen.reset_counters()
+    start = time.perf_counter()
+    for time_string in strings[1:]:
+        draw(time_string)
+    elapsed = time.perf_counter() - start
+    return {"fps": frames / elapsed,
+            "calls": screen.calls / frames,
+            "bytes": screen.bytes / frames}
+
+
+def bench_scaled_glyphs() -> tuple:
+    # ms to generate the glyphs of a new size, and to come back to it
+    size = ct_clock.scaled_size(99)
+    times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        ct_clock.add_scaled_glyphs(size)
+        times.append((time.perf_counter() - start) * 1000)
+    return tuple(times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=2000,
+                        help="frames per case")
+    parser.add_argument("--glyphs", choices=["digits", "half", "braille"],
+                        default="digits", help="glyph style drawn")
+    args = parser.parse_args()
+    print(f"{'size':<8}{'seconds':<9}{'date':<6}{'am_pm':<7}"
+          f"{'frames/s':>10}{'calls/frame':>13}{'bytes/frame':>13}")
+    for size, show_seconds, show_date, am_pm in itertools.product(
+            TERMINAL_SIZES, (True, False), (True, False), (True, False)):
+        result = bench_display(size, show_seconds, show_date, am_pm, args.frames,
+                               args.glyphs)
+        print(f"{size:<8}{str(show_seconds):<9}{str(show_date):<6}"
+              f"{str(am_pm):<7}{result['fps']:>10.0f}"
+              f"{result['calls']:>13.1f}{result['bytes']:>13.1f}")
+    new, seen = bench_scaled_glyphs()
+    print(f"scaled glyphs, 99 rows: {new:.2f} ms new size, {seen:.4f} ms seen before")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
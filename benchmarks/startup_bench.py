@@ -0,0 +1,64 @@
+""" Cold start benchmarks: importing ct_clock and drawing the first frame.
+
+Each case runs in a fresh interpreter.  Run from the repository root:
+python benchmarks/startup_bench.py
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_ONLY = """
+import time
+start = time.perf_counter()
+import ct_clock
+elapsed = time.perf_counter() - start
+import sys
+print(elapsed, "time_machine" in sys.modules)
+"""
+
+FIRST_FRAME = """
+import time
+start = time.perf_counter()
+import ct_clock
+screen = ct_clock.MemoryScreen(26, 100)
+renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+now = ct_clock.MyTime()
+ct_clock.display(screen, now.get_time("%I%M%S"), "large", 100, 26, "white",
+                 True, now.get_time("%p"), True, True, False, False,
+                 now.get_date("%d/%m/%Y"), "black", False, "", renderer)
+elapsed = time.perf_counter() - start
+import sys
+print(elapsed, "time_machine" in sys.modules)
+"""
+
+
+def run_case(code: str, runs: int) -> tuple:
+    times = []
+    loaded = False
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                             check=True, capture_output=True, text=True).stdout
+        elapsed, time_machine_loaded = out.split()
+        times.append(float(elapsed) * 1000)
+        loaded = loaded or time_machine_loaded == "True"
+    return statistics.median(times), min(times), loaded
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20,
+                        help="interpreter starts per case")
+    args = parser.parse_args()
+    print(f"{'case':<14}{'median ms':>11}{'min ms':>9}  time_machine loaded")
+    for name, code in (("import", IMPORT_ONLY), ("first frame", FIRST_FRAME)):
+        median, fastest, loaded = run_case(code, args.runs)
+        print(f"{name:<14}{median:>11.2f}{fastest:>9.2f}  {loaded}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,14 +1,25 @@
 """ Curses terminal digital clock"""
 import argparse
+import contextlib
 import curses
+import heapq
+import os
+import re
+import select
+import stat
+import sys
+import time
+from array import array
+from collections import OrderedDict
 from datetime import datetime
+from datetime import timezone
 
+from typing import Callable
 from typing import Generator
 from typing import Optional
 from typing import Sequence
 from typing import Tuple
-
-import time_machine
+from typing import Union
 
 CURSES_COLORS = {"black": curses.COLOR_BLACK, "white": curses.COLOR_WHITE,
                  "red": curses.COLOR_RED, "green": curses.COLOR_GREEN,
@@ -20,6 +31,16 @@ CHAR_CODES_COLOR_BG = {82: "red", 84: "green", 89: "blue", 85: "yellow",
                        73: "magenta", 79: "cyan", 80: "white", 123: "black"}
 COLORS = ["red", "green", "blue", "yellow", "magenta", "cyan", "white", "black"]
 DATE_FORMATS = ["%d/%m/%Y", "%m/%d/%Y", "%Y/%m/%d", "%Y/%d/%m"]
+LAYOUT_CACHE_SIZE = 32  # frame layouts kept per renderer
+TICK_SLACK_MS = 5  # wake just after the second boundary so the new second is visible
+TEST_DATE = re.compile(r"(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})")
+TEST_TIME = re.compile(r"(\d{1,2}):(\d{1,2})(?::(\d{1,2})(\.\d+)?)?")
+# special keys by the final byte of their escape sequence, ESC [ A or ESC O A
+ANSI_KEYS = {65: curses.KEY_UP, 66: curses.KEY_DOWN, 67: curses.KEY_RIGHT,
+             68: curses.KEY_LEFT, 72: curses.KEY_HOME, 70: curses.KEY_END,
+             80: curses.KEY_F1, 81: curses.KEY_F2, 82: curses.KEY_F3, 83: curses.KEY_F4}
+RESIZE_SETTLE_MS = 50  # quiet time that ends a burst of resizes while a window is dragged
+VIEWER_LINE_MAX = 64  # bytes a viewer may send without a newline before it is dropped
 
 
 class CTClockError(Exception):
@@ -74,107 +95,668 @@ class LrgSeg:
 
 
 class MyTime:
-    # Use for test mode and for possible features.
-    def __init__(self, test_mode: bool,
-                 test_time: Optional[str] = "",
-                 tick: Optional[bool] = True):
-        self.test_mode = test_mode
-        self.test_time = test_time
-        self.tick = tick
-        self.save_time = "00:00:00"
-        self.paused = False
-        if test_mode:
-            self.time = self._time_generator()
-        else:
-            self.time = None
+    # The local time is looked up once per second and every format is
+    # built at most once per second (dates once per day) from that.
+    def __init__(self, clock: Callable[[], float] = time.time):
+        # clock: read instead of time.time(), like a VirtualClock in test mode
+        self.clock = clock
+        self._second = None
+        self._local = None
+        self._formatted = {}
+        self._day = None
+        self._dates = {}
 
-    def _time_generator(self) -> Generator:
-        with time_machine.travel(self.test_time, tick=self.tick):
-            while True:
-                yield datetime.today()
+    def _update(self) -> None:
+        second = int(self.clock())
+        if second != self._second:
+            self._second = second
+            self._local = time.localtime(second)
+            self._formatted = {}
+            day = (self._local.tm_year, self._local.tm_yday)
+            if day != self._day:
+                self._day = day
+                self._dates = {}
+
+    def _format_time(self, time_format: str) -> str:
+        hour = self._local.tm_hour
+        if time_format == "%H%M%S":
+            return f"{hour:02d}{self._local.tm_min:02d}{self._local.tm_sec:02d}"
+        elif time_format == "%I%M%S":
+            hour = hour % 12 or 12
+            return f"{hour:02d}{self._local.tm_min:02d}{self._local.tm_sec:02d}"
+        elif time_format == "%p":
+            return "AM" if hour < 12 else "PM"
+        return time.strftime(time_format, self._local)
 
     def get_time(self, time_format: str) -> str:
-        if self.test_mode:
-            if self.paused:
-                return "".join(self.save_time[0:8].split(":"))
-            return next(self.time).strftime(time_format)
-        else:
-            return datetime.today().strftime(time_format)
+        self._update()
+        text = self._formatted.get(time_format)
+        if text is None:
+            text = self._formatted[time_format] = self._format_time(time_format)
+        return text
 
     def get_date(self, date_format: str) -> str:
-        if self.test_mode:
-            return next(self.time).date().strftime(date_format)
+        self._update()
+        text = self._dates.get(date_format)
+        if text is None:
+            text = self._dates[date_format] = time.strftime(date_format, self._local)
+        return text
+
+
+class VirtualClock:
+    """
+    Stand-in for time.time() that starts at start and runs rate times
+    faster than real time.  With rate 0 it only moves when advanced: the
+    runtime then jumps it from one tick to the next, so a day of the clock
+    is simulated as fast as its frames are drawn.  Nothing global is patched.
+    """
+    def __init__(self, start: float, rate: float = 1.0,
+                 real: Callable[[], float] = time.monotonic):
+        self.start = start
+        self.rate = rate
+        self.real = real
+        self.real_start = real()
+
+    def __call__(self) -> float:
+        return self.start + (self.real() - self.real_start) * self.rate
+
+    def advance(self, seconds: float) -> None:
+        self.start += seconds
+
+
+def real_seconds(clock: Callable[[], float], seconds: float) -> float:
+    # how long to wait for seconds of clock to pass
+    return seconds / getattr(clock, "rate", 1)
+
+
+def get_clock(args: argparse.Namespace, utc: bool = False) -> Callable[[], float]:
+    """
+    time.time, or in test mode a VirtualClock from the test date and time,
+    read as local time or as UTC, that keeps ticking
+    test_speed times faster than real time.
+    """
+    if not args.test_mode:
+        return time.time
+    if args.test_speed <= 0:
+        raise CTClockError("--test_speed has to be above 0")
+    date = TEST_DATE.fullmatch(args.test_date.strip())
+    hms = TEST_TIME.fullmatch(args.test_time.strip())
+    if date is None or hms is None:
+        raise CTClockError(f"Unknown test date or time: {args.test_date} "
+                           f"{args.test_time}")
+    hours, minutes, seconds, fraction = hms.groups(default="0")
+    try:
+        start = datetime(*(int(n) for n in date.groups()), int(hours), int(minutes),
+                         int(seconds), tzinfo=timezone.utc if utc else None)
+    except ValueError as e:
+        raise CTClockError(f"Invalid test date or time: {e}")
+    return VirtualClock(start.timestamp() + float(fraction), args.test_speed)
+
+
+class StopWatch:
+    """
+    Stop watch elapsed time kept in integer nanoseconds from
+    time.perf_counter_ns(), so it needs no time travel, does not drift and
+    does not jump when the system clock is adjusted.
+    """
+    def __init__(self, clock: Callable[[], int] = time.perf_counter_ns):
+        self.clock = clock
+        self.elapsed_ns = 0  # total of the finished run intervals
+        self.started = None  # start of the current run interval
+
+    @property
+    def running(self) -> bool:
+        return self.started is not None
+
+    def start(self) -> None:
+        if self.started is None:
+            self.started = self.clock()
+
+    def pause(self) -> None:
+        if self.started is not None:
+            self.elapsed_ns += self.clock() - self.started
+            self.started = None
+
+    def reset(self) -> None:
+        self.elapsed_ns = 0
+        self.started = None
+
+    def get_elapsed_ns(self) -> int:
+        if self.started is None:
+            return self.elapsed_ns
+        return self.elapsed_ns + self.clock() - self.started
+
+    def get_elapsed(self) -> float:
+        return self.get_elapsed_ns() / 1000000000
+
+    def get_time_fraction(self, precision: int) -> Tuple[str, str]:
+        # HHMMSS and the first precision digits of the second, one clock read
+        total, fraction = divmod(self.get_elapsed_ns(), 1000000000)
+        hours = total // 3600 % 100
+        hhmmss = f"{hours:02d}{total // 60 % 60:02d}{total % 60:02d}"
+        if precision == 0:
+            return hhmmss, ""
+        return hhmmss, f"{fraction:09d}"[:precision]
+
+    def get_time(self) -> str:
+        return self.get_time_fraction(0)[0]
+
+
+def format_ns(ns: int) -> str:
+    # HH:MM:SS.ff of a duration
+    total, fraction = divmod(ns, 1000000000)
+    return (f"{total // 3600 % 100:02d}:{total // 60 % 60:02d}:{total % 60:02d}."
+            f"{fraction // 10000000:02d}")
+
+
+class LapStore:
+    """
+    Stop watch laps as their split times, the elapsed nanoseconds when the
+    lap was taken, in an array of 8 byte integers.  A lap is also appended to
+    out, if given, as a CSV row or a JSON line.  The file object buffers the
+    rows, they are written out in blocks and when the file is closed.
+    """
+    def __init__(self, out=None, json_lines: bool = False):
+        self.splits = array("q")
+        self.out = out
+        self.json_lines = json_lines
+        if json_lines:
+            import json  # only laps written as JSON lines need it
+
+            self.dumps = json.dumps
+        elif out is not None and out.tell() == 0:
+            out.write("lap,split_ns,lap_ns\n")
+
+    def __len__(self) -> int:
+        return len(self.splits)
+
+    def lap_ns(self, index: int) -> int:
+        return self.splits[index] - (self.splits[index - 1] if index else 0)
+
+    def add(self, split_ns: int) -> None:
+        self.splits.append(split_ns)
+        if self.out is None:
+            return
+        number, lap_ns = len(self.splits), self.lap_ns(len(self.splits) - 1)
+        if self.json_lines:
+            self.out.write(self.dumps({"lap": number, "split_ns": split_ns,
+                                       "lap_ns": lap_ns}) + "\n")
         else:
-            return datetime.today().date().strftime(date_format)
+            self.out.write(f"{number},{split_ns},{lap_ns}\n")
+
+    def clear(self) -> None:
+        # the file keeps the laps, numbering starts again at 1
+        self.splits = array("q")
+
+    def close(self) -> None:
+        if self.out is not None:
+            self.out.close()
 
-    def reset_time(self) -> None:
-        # used in the context manager in the test suite
-        if self.test_mode:
-            self.time.close()
+    def latest_lines(self, count: int) -> list:
+        # the last count laps, newest first, as lines of equal width
+        lines = []
+        last = len(self.splits) - 1
+        for index in range(last, max(last - count, -1), -1):
+            lines.append(f"{index + 1:>5}  {format_ns(self.splits[index])}  "
+                         f"+{format_ns(self.lap_ns(index))}")
+        return lines
+
+
+def open_laps(path: str) -> LapStore:
+    try:
+        out = open(path, "a", encoding="utf-8")
+    except OSError as e:
+        raise CTClockError(f"Can not write laps to {path}: {e.strerror}")
+    return LapStore(out, path.endswith((".jsonl", ".json")))
 
-    def pause(self):
-        self.save_time = next(self.time).time().strftime("%H:%M:%S.%f")
-        self.time.close()
-        self.paused = True
 
-    def unpause(self):
-        self.test_time = self.save_time
-        self.time = self._time_generator()
-        self.paused = False
+class Countdown:
+    """
+    Named countdown of the timer subcommand.  While it runs it is a deadline
+    in integer nanoseconds from time.monotonic_ns(), while it is stopped or
+    paused it is the time left.
+    """
+    def __init__(self, name: str, duration_ns: int,
+                 clock: Callable[[], int] = time.monotonic_ns):
+        self.name = name
+        self.duration_ns = duration_ns
+        self.clock = clock
+        self.left_ns = duration_ns
+        self.deadline = None
+        self.state = "Stopped"  # running, paused, stopped, done
+
+    @property
+    def running(self) -> bool:
+        return self.deadline is not None
+
+    def start(self) -> None:
+        if self.deadline is None and self.left_ns > 0:
+            self.deadline = self.clock() + self.left_ns
+            self.state = "Running"
+
+    def pause(self) -> None:
+        if self.deadline is not None:
+            self.left_ns = max(self.deadline - self.clock(), 0)
+            self.deadline = None
+            self.state = "Paused" if self.left_ns else "Done"
+
+    def reset(self) -> None:
+        self.left_ns = self.duration_ns
+        self.deadline = None
+        self.state = "Stopped"
+
+    def expire(self) -> None:
+        self.left_ns = 0
+        self.deadline = None
+        self.state = "Done"
+
+    def get_left_ns(self, now: Optional[int] = None) -> int:
+        if self.deadline is None:
+            return self.left_ns
+        if now is None:
+            now = self.clock()
+        return max(self.deadline - now, 0)
+
+    def get_time(self, now: Optional[int] = None) -> str:
+        # whole seconds rounded up, so 00:00:00 only shows once it is done
+        total = -(-self.get_left_ns(now) // 1000000000)
+        return f"{total // 3600 % 100:02d}{total // 60 % 60:02d}{total % 60:02d}"
+
+
+class TimerQueue:
+    """
+    Deadlines of the running countdowns in a heap, so the next expiry is
+    found without looking at every countdown.  Entries of countdowns paused,
+    reset or started again after they were pushed stay in the heap and are
+    dropped when they come to the top.
+    """
+    def __init__(self, countdowns: Sequence[Countdown]):
+        self.countdowns = countdowns
+        self.heap = []  # (deadline, index)
+
+    def push(self, index: int) -> None:
+        heapq.heappush(self.heap, (self.countdowns[index].deadline, index))
 
-    def reset(self):
-        self.time.close()
-        self.save_time = self.test_time = "00:00:00"
-        self.time = self._time_generator()
-        self.paused = True
+    def next_deadline(self) -> Optional[int]:
+        heap = self.heap
+        while heap and self.countdowns[heap[0][1]].deadline != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    def pop_expired(self, now: int) -> list:
+        # expires the countdowns whose deadline passed, earliest first
+        expired = []
+        deadline = self.next_deadline()
+        while deadline is not None and deadline <= now:
+            index = heapq.heappop(self.heap)[1]
+            self.countdowns[index].expire()
+            expired.append(index)
+            deadline = self.next_deadline()
+        return expired
+
+
+class ZoneTime:
+    """
+    Time of day in one IANA time zone for the dashboard.  The zone's local
+    time is looked up at most once per second.
+    """
+    def __init__(self, zone):
+        self.zone = zone
+        self.name = str(zone)
+        self._second = None
+        self._local = None
+
+    def get_time(self, second: int, military_time: bool) -> Tuple[str, str]:
+        if second != self._second:
+            self._second = second
+            self._local = datetime.fromtimestamp(second, self.zone)
+        hour = self._local.hour
+        am_pm = ""
+        if not military_time:
+            am_pm = "AM" if hour < 12 else "PM"
+            hour = hour % 12 or 12
+        return f"{hour:02d}{self._local.minute:02d}{self._local.second:02d}", am_pm
+
+
+def load_zones(names: Sequence[str]) -> list:
+    try:
+        from zoneinfo import ZoneInfo  # only the dashboard needs it
+    except ImportError:
+        raise CTClockError("dashboard needs Python 3.9 or newer (zoneinfo)")
+    zones = []
+    for name in names:
+        try:
+            zones.append(ZoneTime(ZoneInfo(name)))
+        except (KeyError, ValueError):
+            raise CTClockError(f"Unknown time zone: {name}")
+    return zones
+
+
+class TickScheduler:
+    """
+    The boundaries of the time shown, one every interval on the time line
+    of clock.  Runtime schedules its next tick timeout_ms() ahead.
+    """
+    def __init__(self, interval: float = 1.0,
+                 clock: Callable[[], float] = time.time):
+        self.interval = interval
+        self.clock = clock
+
+    def timeout_ms(self) -> int:
+        now = self.clock()
+        delay = self.interval - now % self.interval
+        return round(delay * 1000) + TICK_SLACK_MS
+
+
+class Runtime:
+    """
+    asyncio event loop of the clock, the stop watch, the timer and the
+    dashboard.  Keys are read when the terminal turns readable
+    (loop.add_reader), a tick is scheduled for the next boundary of the time
+    shown, and the mode draws at most one frame per wake-up, after every
+    pending key was handled.  Other event sources join the same loop with
+    add_reader, call_later or add_signal_handler instead of polling.
+
+    The mode gives scheduler (clock and timeout_ms()), idle (no ticks
+    needed) and key(ch), resize(), draw() and close(); key returns True to
+    quit.
+    """
+    def __init__(self, screen):
+        self.screen = screen
+        self.mode = None
+        self.loop = None
+        self.wake = None  # asyncio.Event, set when there may be a frame to draw
+        self.done = False
+        self.error = None  # raised in a callback, raised again by the main task
+        self.until = None
+        self.tick = None  # handle of the next tick
+        self.settle = None  # handle of the relayout after a burst of resizes
+
+    def run(self, mode, until: Optional[float] = None) -> None:
+        # until: stop once the time line of the mode's scheduler gets there
+        import asyncio  # only the loops need it, keep it off startup
+
+        self.mode = mode
+        self.until = until
+        try:
+            asyncio.run(self.main())
+        finally:
+            mode.close()
+
+    async def main(self) -> None:
+        import asyncio
+        import signal
+
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        # curses windows read stdin and are resized on SIGWINCH, other
+        # screens give their file descriptors, a MemoryScreen has none
+        input_fds = getattr(self.screen, "input_fds", None)
+        fds = [sys.stdin.fileno()] if input_fds is None else input_fds()
+        for fd in fds:
+            self.loop.add_reader(fd, self.read_keys)
+        if input_fds is None:
+            self.loop.add_signal_handler(signal.SIGWINCH, self.sigwinch)
+        try:
+            while True:
+                self.mode.draw()
+                if not fds:
+                    self.read_keys()  # the keys of a MemoryScreen, at every wake-up
+                if self.error is not None:
+                    raise self.error
+                if self.done:
+                    break
+                if self.until is not None and self.mode.scheduler.clock() >= self.until:
+                    break
+                self.schedule_tick()
+                await self.wait()
+        finally:
+            for handle in (self.tick, self.settle):
+                if handle is not None:
+                    handle.cancel()
+            for fd in fds:
+                self.loop.remove_reader(fd)
+            if input_fds is None:
+                self.loop.remove_signal_handler(signal.SIGWINCH)
+
+    async def wait(self) -> None:
+        await self.wake.wait()
+        self.wake.clear()
+
+    def schedule_tick(self) -> None:
+        if self.tick is not None:
+            self.tick.cancel()
+        self.tick = None
+        if self.mode.idle:
+            return
+        clock = self.mode.scheduler.clock
+        delay = self.mode.scheduler.timeout_ms() / 1000
+        if getattr(clock, "rate", 1) == 0:
+            clock.advance(delay)  # a simulation goes straight to the tick
+            self.tick = self.loop.call_soon(self.wake.set)
+        else:
+            self.tick = self.loop.call_later(real_seconds(clock, delay), self.wake.set)
+
+    def read_keys(self) -> None:
+        # every pending key, the frame is drawn once they are all handled
+        self.screen.timeout(0)
+        try:
+            while not self.done:
+                ch = self.screen.getch()
+                if ch == -1:
+                    break
+                if ch == curses.KEY_RESIZE:
+                    self.resized()  # wakes up once the burst is over
+                    continue
+                self.done = self.mode.key(ch)
+                self.wake.set()
+        except Exception as e:  # the loop would only log it
+            self.error = e
+            self.wake.set()
+
+    def sigwinch(self) -> None:
+        # the SIGWINCH handler of curses was replaced, curses is told here.
+        # It queues a KEY_RESIZE, read_keys only pushes the relayout back.
+        with contextlib.suppress(OSError, curses.error):
+            curses.resizeterm(*os.get_terminal_size(sys.stdout.fileno())[::-1])
+        self.resized()
+
+    def resized(self) -> None:
+        # one relayout for a burst of resizes, once the size holds still
+        if self.settle is not None:
+            self.settle.cancel()
+        self.settle = self.loop.call_later(RESIZE_SETTLE_MS / 1000, self.relayout)
+
+    def relayout(self) -> None:
+        self.settle = None
+        try:
+            self.mode.resize()
+        except Exception as e:
+            self.error = e
+        self.wake.set()
+
+
+SEGMENT_CLASSES = {"small": SmSeg, "medium": MedSeg, "large": LrgSeg}
+DIGIT_SEGMENTS = {
+    "0": ("seg1", "seg2", "seg3", "seg4", "seg5", "seg6"),
+    "1": ("seg2", "seg3"),
+    "2": ("seg1", "seg2", "seg7", "seg5", "seg4"),
+    "3": ("seg1", "seg2", "seg7", "seg3", "seg4"),
+    "4": ("seg6", "seg7", "seg2", "seg3"),
+    "5": ("seg1", "seg6", "seg7", "seg3", "seg4"),
+    "6": ("seg6", "seg5", "seg4", "seg3", "seg7"),
+    "7": ("seg1", "seg2", "seg3"),
+    "8": ("seg1", "seg2", "seg3", "seg4", "seg5", "seg6", "seg7"),
+    "9": ("seg1", "seg2", "seg3", "seg4", "seg6", "seg7"),
+    ":": ("colon",),
+}
 
 
 def get_segments(number: str, size: str) -> tuple:
-    if size == "small":
-        seg = SmSeg
-    elif size == "medium":
-        seg = MedSeg
-    elif size == "large":
-        seg = LrgSeg
-    else:
-        seg = SmSeg
-    if number == "0":
-        return seg.seg1 + seg.seg2 + seg.seg3 + seg.seg4 + seg.seg5 + seg.seg6
-    elif number == "1":
-        return seg.seg2 + seg.seg3
-    elif number == "2":
-        return seg.seg1 + seg.seg2 + seg.seg7 + seg.seg5 + seg.seg4
-    elif number == "3":
-        return seg.seg1 + seg.seg2 + seg.seg7 + seg.seg3 + seg.seg4
-    elif number == "4":
-        return seg.seg6 + seg.seg7 + seg.seg2 + seg.seg3
-    elif number == "5":
-        return seg.seg1 + seg.seg6 + seg.seg7 + seg.seg3 + seg.seg4
-    elif number == "6":
-        return seg.seg6 + seg.seg5 + seg.seg4 + seg.seg3 + seg.seg7
-    elif number == "7":
-        return seg.seg1 + seg.seg2 + seg.seg3
-    elif number == "8":
-        return seg.seg1 + seg.seg2 + seg.seg3 + seg.seg4 + seg.seg5 + \
-               seg.seg6 + seg.seg7
-    elif number == "9":
-        return seg.seg1 + seg.seg2 + seg.seg3 + seg.seg4 + seg.seg6 + seg.seg7
-    elif number == ":":
-        return seg.colon
-
-
-def get_offset(size: str) -> int:
+    seg = SEGMENT_CLASSES.get(size, SmSeg)
+    segments = ()
+    for name in DIGIT_SEGMENTS.get(number, ()):
+        segments += getattr(seg, name)
+    return segments
+
+
+def build_glyphs() -> dict:
+    # (size, char) -> row sorted cells with the segment overlaps removed
+    glyphs = {}
+    for size in SEGMENT_CLASSES:
+        for char in DIGIT_SEGMENTS:
+            glyphs[(size, char)] = tuple(sorted(set(get_segments(char, size))))
+    return glyphs
+
+
+def compile_spans(cells: tuple) -> tuple:
+    """
+    Turn row sorted (row, col) cells into horizontal runs of
+    (row, start_col, length) so each run can be drawn with one addstr.
+    """
+    spans = []
+    for row, col in cells:
+        if spans and spans[-1][0] == row and spans[-1][1] + spans[-1][2] == col:
+            spans[-1][2] += 1
+        else:
+            spans.append([row, col, 1])
+    return tuple(tuple(span) for span in spans)
+
+
+GLYPHS = build_glyphs()
+GLYPH_SPANS = {key: compile_spans(cells) for key, cells in GLYPHS.items()}
+
+
+def scaled_segments(size: tuple) -> dict:
+    """
+    Cells of the segments and the colon of a (height, width, thickness)
+    digit.  (5, 3, 1), (7, 4, 1) and (18, 10, 2) give the SmSeg, MedSeg
+    and LrgSeg digits.
+    """
+    height, width, thickness = size
+    middle = (height - thickness) // 2  # top row of the middle segment
+    right = width - thickness
+
+    def block(top: int, bottom: int, left: int, right: int) -> tuple:
+        return tuple((row, col) for row in range(top, bottom)
+                     for col in range(left, right))
+
+    # colon dots centred in the gaps above and below the middle segment,
+    # and between this digit and the next
+    upper = (thickness + middle) // 2 - (thickness - 1) // 2
+    lower = (middle + height - 1) // 2 - (thickness - 1) // 2
+    colon_x = width + (thickness + 1) // 2
+    return {
+        "seg1": block(0, thickness, 0, width),
+        "seg2": block(0, middle + thickness, right, width),
+        "seg3": block(middle, height, right, width),
+        "seg4": block(height - thickness, height, 0, width),
+        "seg5": block(middle, height, 0, thickness),
+        "seg6": block(0, middle + thickness, 0, thickness),
+        "seg7": block(middle, middle + thickness, 0, width),
+        "colon": block(upper, upper + thickness, colon_x, colon_x + thickness)
+        + block(lower, lower + thickness, colon_x, colon_x + thickness),
+    }
+
+
+def add_scaled_glyphs(size: tuple) -> None:
+    # generated once per size, going back to a size seen before is a lookup
+    if (size, "8") in GLYPHS:
+        return
+    segments = scaled_segments(size)
+    for char, names in DIGIT_SEGMENTS.items():
+        cells = tuple(sorted(set(cell for name in names for cell in segments[name])))
+        GLYPHS[(size, char)] = cells
+        GLYPH_SPANS[(size, char)] = compile_spans(cells)
+
+
+def scaled_size(height: int) -> Tuple[int, int, int]:
+    # the proportions of the fixed sizes, about 5 columns and 1/9 stroke per 9 rows
+    return height, max(3, (height * 5 + 4) // 9), max(1, height // 9)
+
+
+# the fixed sizes as (height, width, thickness), the source of their raster glyphs
+SCALED_SIZES = {"small": (5, 3, 1), "medium": (7, 4, 1), "large": (18, 10, 2)}
+# glyph styles drawn with sub-cell pixels: (pixels across, pixels down) per cell
+RASTER_PIXELS = {"half": (1, 2), "braille": (2, 4)}
+HALF_BLOCKS = " \u2580\u2584\u2588"  # by mask: top pixel 1, bottom pixel 2
+BRAILLE_DOTS = ((0x01, 0x08), (0x02, 0x10), (0x04, 0x20), (0x40, 0x80))
+RASTER_SPANS = {}  # (size, char, style): row sorted (row, col, text) runs
+
+
+def rasterise(pixels: Sequence[Tuple[int, int]], style: str) -> tuple:
+    """
+    Pack (row, col) pixels into half block or braille cells.  Returns the
+    cells as (row, col, text) runs, empty cells left out.
+    """
+    across, down = RASTER_PIXELS[style]
+    masks = {}
+    for row, col in pixels:
+        if style == "half":
+            bit = 1 << row % 2
+        else:
+            bit = BRAILLE_DOTS[row % 4][col % 2]
+        cell = (row // down, col // across)
+        masks[cell] = masks.get(cell, 0) | bit
+    runs = []
+    for (row, col), mask in sorted(masks.items()):
+        ch = HALF_BLOCKS[mask] if style == "half" else chr(0x2800 + mask)
+        if runs and runs[-1][0] == row and runs[-1][1] + len(runs[-1][2]) == col:
+            runs[-1][2] += ch
+        else:
+            runs.append([row, col, ch])
+    return tuple(tuple(run) for run in runs)
+
+
+def add_raster_glyphs(size, style: str) -> None:
+    """
+    Raster glyphs with the footprint of size, from seven segments drawn
+    with as many pixels as the style packs into that many cells.  Built
+    once per size and style.
+    """
+    if (size, "8", style) in RASTER_SPANS:
+        return
+    height, width, thickness = SCALED_SIZES.get(size, size)
+    across, down = RASTER_PIXELS[style]
+    # strokes keep their width, horizontal ones get thinner with the pixels
+    segments = scaled_segments((height * down, width * across, thickness * across))
+    for char, names in DIGIT_SEGMENTS.items():
+        pixels = set(cell for name in names for cell in segments[name])
+        RASTER_SPANS[(size, char, style)] = rasterise(pixels, style)
+
+
+FRACTION_SIZES = {"large": "medium", "medium": "small"}
+
+
+def get_fraction_size(size) -> Optional[Union[str, tuple]]:
+    # glyphs for fractions of a second, None when they are too small to draw
+    if isinstance(size, str):
+        return FRACTION_SIZES.get(size)
+    if size[0] // 2 < 5:
+        return None
+    return scaled_size(size[0] // 2)
+
+
+def get_glyph_width(size) -> int:
+    return max(col for _, col in GLYPHS[(size, "8")]) + 1
+
+
+def get_offset(size) -> int:
     if size == "small":
         return 5
     elif size == "medium":
         return 6
     elif size == "large":
         return 14
+    return size[1] + 2 * size[2]  # scaled: width and a gap of two strokes
 
 
-def get_space_size(size: str, show_seconds: bool) -> Tuple[int, int]:
+def get_space_size(size, show_seconds: bool) -> Tuple[int, int]:
     h = w = 0
-    if size == "small":
+    if not isinstance(size, str):
+        h = size[0]
+        w = get_offset(size) * (6 if show_seconds else 4)
+    elif size == "small":
         h = 5
         w = 30 if show_seconds else 20
     elif size == "medium":
@@ -186,321 +768,1741 @@ def get_space_size(size: str, show_seconds: bool) -> Tuple[int, int]:
     return h, w
 
 
-def fill_background(screen, bg_color: str) -> None:
-    curses.init_pair(3, CURSES_COLORS[bg_color], CURSES_COLORS[bg_color])
+# (size, minimum columns, minimum rows), largest first
+TEXT_SIZES = (("large", 90, 20), ("medium", 46, 10), ("small", 36, 8))
+
+
+def get_text_size(size_x: int, size_y: int, header_rows: int = 0,
+                  scale: bool = False) -> Union[str, tuple]:
+    # header_rows: text lines kept free above and below the digits
+    if scale:
+        size = get_scaled_size(size_x, size_y, header_rows)
+        if size is not None:
+            return size  # otherwise the fixed sizes, small needs less room
+    for size, min_x, min_y in TEXT_SIZES:
+        height = get_space_size(size, True)[0]
+        if size_x >= min_x and size_y >= max(min_y, height + 2 * header_rows):
+            return size
+    raise CTClockError("Error screen / window is to small")
+
+
+def get_scaled_size(size_x: int, size_y: int, header_rows: int = 0) -> Optional[tuple]:
+    """
+    The tallest (height, width, thickness) digits that fit, None when
+    none do.  10 columns are kept beside the digits for the colons and
+    AM/PM, and a line under them or header_rows above and below.
+    """
+    for height in range(size_y - max(2, 2 * header_rows), 4, -1):
+        size = scaled_size(height)
+        if get_space_size(size, True)[1] + 10 <= size_x:
+            return size
+    return None
+
+
+def screen_layout(screen, header_rows: int = 0,
+                  scale: bool = False) -> Tuple[int, int, Union[str, tuple]]:
+    # size_y, size_x and the text size that fits, at start and after a resize
+    size_y, size_x = screen.getmaxyx()
+    return size_y, size_x, get_text_size(size_x, size_y, header_rows, scale)
+
+
+class ColorPairs:
+    """
+    Hands out one curses color pair per (fg, bg) combination.  init_pair is
+    only called the first time a combination is used, so frames drawn with
+    unchanged colors send no palette updates to the terminal.
+    The backend is the curses module or anything with the same
+    init_pair / color_pair / COLOR_PAIRS, like MemoryScreen.
+    """
+    def __init__(self, backend=curses):
+        self.backend = backend
+        self.pairs = {}
+        self.generation = 0  # bumped when pairs get reused for new colors
+
+    def get(self, fg: str, bg: str) -> int:
+        attr = self.pairs.get((fg, bg))
+        if attr is None:
+            number = len(self.pairs) + 1
+            if number >= self.backend.COLOR_PAIRS:
+                # out of pairs, start handing them out again from the first
+                self.pairs.clear()
+                self.generation += 1
+                number = 1
+            self.backend.init_pair(number, CURSES_COLORS[fg], CURSES_COLORS[bg])
+            attr = self.pairs[(fg, bg)] = self.backend.color_pair(number)
+        return attr
+
+
+class MemoryScreen:
+    """
+    Headless stand-in for the part of the curses window API used by
+    display() and the main loops.  Cells are kept in memory and every call
+    is counted, so frames can be checked and benchmarked without a terminal.
+    """
+    COLOR_PAIRS = 256
+
+    def __init__(self, height: int = 24, width: int = 80,
+                 keys: Sequence[int] = ()):
+        self.height = height
+        self.width = width
+        self.keys = list(keys)
+        self.delay = -1
+        self.pairs = {0: (curses.COLOR_WHITE, curses.COLOR_BLACK)}
+        self.cells = [[(" ", 0)] * width for _ in range(height)]
+        self.parent = None
+        self.top = self.left = 0  # position in the cells of the top window
+        self.beeps = 0
+        self.reset_counters()
+
+    def reset_counters(self) -> None:
+        self.calls = 0
+        self.bytes = 0
+        self.updates = 0
+
+    def _count(self, text: str = "") -> None:
+        window = self
+        while window is not None:  # subwindow calls count for the parents too
+            window.calls += 1
+            window.bytes += len(text.encode())
+            window = window.parent
+
+    def _blank(self) -> None:
+        for row in self.cells[self.top:self.top + self.height]:
+            row[self.left:self.left + self.width] = [(" ", 0)] * self.width
+
+    def derwin(self, height: int, width: int, y: int, x: int) -> "MemoryScreen":
+        if y < 0 or x < 0 or y + height > self.height or x + width > self.width:
+            raise curses.error("derwin() returned ERR")
+        window = MemoryScreen(0, 0)
+        window.height, window.width = height, width
+        window.pairs = self.pairs
+        window.cells = self.cells
+        window.parent = self
+        window.top, window.left = self.top + y, self.left + x
+        return window
+
+    def init_pair(self, number: int, fg: int, bg: int) -> None:
+        self.pairs[number] = (fg, bg)
+
+    @staticmethod
+    def color_pair(number: int) -> int:
+        return number << 8  # same layout as curses.color_pair
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        self._count(text)
+        if not 0 <= y < self.height or not 0 <= x < self.width:
+            raise curses.error("addstr() returned ERR")
+        # like curses, text running past the right edge wraps to the next row
+        for ch in text:
+            if y == self.height:
+                raise curses.error("addstr() returned ERR")
+            self.cells[self.top + y][self.left + x] = (ch, attr)
+            x += 1
+            if x == self.width:
+                y, x = y + 1, 0
+
+    def clear(self) -> None:
+        self._count()
+        self._blank()
+
+    def erase(self) -> None:
+        self._count()
+        self._blank()
+
+    def refresh(self) -> None:
+        self._count()
+
+    def noutrefresh(self) -> None:
+        self._count()
+
+    def doupdate(self) -> None:
+        self.updates += 1
+
+    def beep(self) -> None:
+        self.beeps += 1
+
+    def timeout(self, delay: int) -> None:
+        self.delay = delay
+
+    def getch(self) -> int:
+        return self.keys.pop(0) if self.keys else -1
+
+    @staticmethod
+    def input_fds() -> list:
+        # no file to wait on, Runtime reads the keys at every wake-up and
+        # a -1 in keys waits for the next one
+        return []
+
+    def colors_at(self, y: int, x: int) -> Tuple[int, int]:
+        return self.pairs[self.cells[self.top + y][self.left + x][1] >> 8]
+
+    def text(self) -> str:
+        rows = []
+        for row in self.cells[self.top:self.top + self.height]:
+            cells = row[self.left:self.left + self.width]
+            rows.append("".join(ch for ch, _ in cells).rstrip())
+        return "\n".join(rows)
+
+
+class AnsiScreen:
+    """
+    Stand-in for a curses window that turns draws into ANSI escape codes.
+    The codes are buffered and handed to write() on doupdate (or refresh),
+    so each frame leaves as one write.
+    """
+    COLOR_PAIRS = 256
+
+    def __init__(self, height: int, width: int, write: Callable[[bytes], None]):
+        self.height = height
+        self.width = width
+        self.write = write
+        self.sgr = {}  # escape code of each color pair
+        self.init_pair(0, curses.COLOR_WHITE, curses.COLOR_BLACK)
+        self.buffer = []
+        self.attr = None  # attribute the terminal is set to
+        self.cursor = None  # (y, x) of the terminal cursor when known
+        self.bytes = 0
+        self.writes = 0
+
+    def init_pair(self, number: int, fg: int, bg: int) -> None:
+        # the curses color numbers are in the ANSI color order
+        self.sgr[number] = f"\x1b[{30 + fg};{40 + bg}m"
+
+    @staticmethod
+    def color_pair(number: int) -> int:
+        return number << 8
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        if attr != self.attr:
+            self.buffer.append(self.sgr[attr >> 8])
+            self.attr = attr
+        cursor = self.cursor or (None, None)
+        # the shortest move from where the cursor is
+        if (y, x) == cursor:
+            pass
+        elif y == cursor[0]:
+            self.buffer.append(f"\x1b[{x + 1}G")
+        elif x == cursor[1]:
+            self.buffer.append(f"\x1b[{y + 1}d")
+        else:
+            self.buffer.append(f"\x1b[{y + 1};{x + 1}H")
+        self.buffer.append(text)
+        x += len(text)
+        # past the right edge the cursor wraps or waits, depending on the terminal
+        self.cursor = (y, x) if x < self.width else None
+
+    def clear(self) -> None:
+        self.buffer.append("\x1b[0m\x1b[H\x1b[2J")
+        self.attr = None
+        self.cursor = (0, 0)
+
+    def erase(self) -> None:
+        self.clear()
+
+    def derwin(self, height: int, width: int, y: int, x: int) -> "AnsiWindow":
+        if y < 0 or x < 0 or y + height > self.height or x + width > self.width:
+            raise curses.error("derwin() returned ERR")
+        return AnsiWindow(self, height, width, y, x)
+
+    def beep(self) -> None:
+        self.buffer.append("\a")  # rings with the next update
+
+    def noutrefresh(self) -> None:
+        pass  # draws are kept in the buffer until doupdate
+
+    def doupdate(self) -> None:
+        if self.buffer:
+            data = "".join(self.buffer).encode()
+            self.buffer = []
+            self.bytes += len(data)
+            self.writes += 1
+            self.write(data)
+
+    def refresh(self) -> None:
+        self.doupdate()
+
+
+class AnsiWindow:
+    """
+    Subwindow of an AnsiScreen, its draws go to the buffer of the screen
+    moved by the position of the window.
+    """
+    def __init__(self, screen: AnsiScreen, height: int, width: int, y: int, x: int):
+        self.screen = screen
+        self.height = height
+        self.width = width
+        self.top = y
+        self.left = x
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        return self.height, self.width
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        self.screen.addstr(self.top + y, self.left + x, text, attr)
+
+    def clear(self) -> None:
+        # blanks the cells of the window, but not the bottom right cell of
+        # the terminal so it can not scroll
+        right = self.left + self.width
+        for y in range(self.top, self.top + self.height):
+            if y == self.screen.height - 1 and right == self.screen.width:
+                right -= 1
+            self.screen.addstr(y, self.left, " " * (right - self.left))
+
+    def erase(self) -> None:
+        self.clear()
+
+    def noutrefresh(self) -> None:
+        pass
+
+
+def parse_keys(data: bytes) -> Tuple[list, bytes]:
+    """
+    Key codes of the bytes read from a terminal.  The escape sequences of
+    special keys (CSI and SS3) become curses.KEY_* codes like with keypad,
+    unknown ones are dropped, so their bytes never reach the key tables.  A
+    sequence cut off at the end is given back to complete with the next read.
+    """
+    keys = []
+    i = 0
+    while i < len(data):
+        if data[i] != 27 or i + 1 == len(data) or data[i + 1] not in b"[O":
+            keys.append(data[i])
+            i += 1
+            continue
+        end = i + 2  # SS3 is one more byte, CSI runs to a byte in 0x40-0x7e
+        if data[i + 1] == 91:
+            while end < len(data) and not 0x40 <= data[end] <= 0x7e:
+                end += 1
+        if end >= len(data):
+            return keys, data[i:]
+        if data[end] in ANSI_KEYS:
+            keys.append(ANSI_KEYS[data[end]])
+        i = end + 1
+    return keys, b""
+
+
+class AnsiTerminal(AnsiScreen):
+    """
+    AnsiScreen on the terminal ct_clock runs in, with the getch and timeout
+    the main loops need.  Used instead of curses with --ansi.  Without a
+    terminal to read keys from (stdin None) it only draws, sized by COLUMNS
+    and LINES when stdout is not a terminal either.
+    """
+    def __init__(self, wakeup, stdin: Optional[int]):
+        self.stdin = stdin
+        self.out = sys.stdout.buffer
+        self.wakeup = wakeup  # readable after a resize
+        self.delay = -1
+        self.keys = []
+        self.partial = b""  # an escape sequence cut off by the last read
+        columns, lines = self._size()
+        super().__init__(lines, columns, self._write)
+
+    def _write(self, data: bytes) -> None:
+        self.out.write(data)
+        self.out.flush()
+
+    def _size(self) -> os.terminal_size:
+        try:
+            return os.get_terminal_size(self.out.fileno())
+        except OSError:
+            import shutil  # COLUMNS and LINES, or 80x24
+
+            return shutil.get_terminal_size()
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        columns, lines = self._size()
+        self.height, self.width = lines, columns
+        return lines, columns
+
+    def timeout(self, delay: int) -> None:
+        self.delay = delay
+
+    def input_fds(self) -> list:
+        return [fd for fd in (self.stdin, self.wakeup) if fd is not None]
+
+    def getch(self) -> int:
+        if not self.keys:
+            delay = None if self.delay < 0 else self.delay / 1000
+            readable = select.select(self.input_fds(), [], [], delay)[0]
+            if self.stdin in readable:
+                keys, self.partial = parse_keys(self.partial + os.read(self.stdin, 64))
+                self.keys.extend(keys)
+            if self.wakeup in readable:
+                os.read(self.wakeup, 64)
+                return curses.KEY_RESIZE  # like curses after a SIGWINCH
+        return self.keys.pop(0) if self.keys else -1
+
+
+@contextlib.contextmanager
+def raw_terminal(stdin: Optional[int]) -> Generator:
+    """
+    Keys without echo or line buffering when stdin is a terminal, the
+    alternate screen and no cursor.  Yields a file descriptor that turns
+    readable when the terminal is resized.
+    """
+    import signal
+    import termios
+    import tty
+
+    out = sys.stdout.buffer
+    saved = None if stdin is None else termios.tcgetattr(stdin)
+    wakeup, wakeup_signal = os.pipe()
+    os.set_blocking(wakeup_signal, False)
+    previous = signal.signal(signal.SIGWINCH, lambda signum, frame: None)
+    signal.set_wakeup_fd(wakeup_signal)
+    out.write(b"\x1b[?1049h\x1b[?25l")
+    out.flush()
+    try:
+        if stdin is not None:
+            tty.setcbreak(stdin)
+        yield wakeup
+    finally:
+        if stdin is not None:
+            termios.tcsetattr(stdin, termios.TCSADRAIN, saved)
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGWINCH, previous)
+        out.write(b"\x1b[0m\x1b[?25h\x1b[?1049l")
+        out.flush()
+        os.close(wakeup)
+        os.close(wakeup_signal)
+
+
+def terminal_stdin() -> Optional[int]:
+    # stdin when keys can be read from it, None on a kiosk or with ssh -T
+    if sys.stdin is not None and sys.stdin.isatty():
+        return sys.stdin.fileno()
+    return None
+
+
+def ansi_wrapper(func: Callable, *args):
+    # like curses.wrapper, for the loops drawn with ANSI escape codes
+    stdin = terminal_stdin()
+    with raw_terminal(stdin) as wakeup:
+        return func(AnsiTerminal(wakeup, stdin), *args)
+
+
+def curses_wrapper(func: Callable, *args):
+    def start(screen):
+        curses.curs_set(0)  # Set the cursor to off.
+        return func(screen, *args)
+
+    return curses.wrapper(start)
+
+
+def screen_colors(screen) -> ColorPairs:
+    # curses windows share the terminal's pairs, other screens keep their own
+    return ColorPairs(screen if hasattr(screen, "init_pair") else curses)
+
+
+def doupdate(screen) -> None:
+    # send what the windows of the screen drew since the last update
+    if hasattr(screen, "doupdate"):
+        screen.doupdate()
+    else:
+        curses.doupdate()
+
+
+def bell(screen) -> None:
+    if hasattr(screen, "beep"):
+        screen.beep()
+    else:
+        curses.beep()
+
+
+def fill_background(screen, attr: int) -> None:
+    # One full width write per row, the last row is left alone so the
+    # bottom right cell is never written and the terminal can not scroll.
     height, width = screen.getmaxyx()
+    blank_row = " " * width
     for y in range(height - 1):
-        for x in range(width):
-            screen.addstr(y, x, " ", curses.color_pair(3))
+        screen.addstr(y, 0, blank_row, attr)
 
 
-def set_color(color: str, bg_color: str) -> None:
-    curses.init_pair(1, CURSES_COLORS[color], CURSES_COLORS[color])
-    curses.init_pair(2, CURSES_COLORS[color], CURSES_COLORS[bg_color])
+class FrameRenderer:
+    """
+    Keeps the cells drawn by the previous frame, per part of the frame like
+    a digit slot or the colons, so that display() only rebuilds the parts
+    that changed and repaints the cells that turned on, off or changed.
+    The background is only
+    refilled when the background color or the terminal size change.
+    Frame layouts are kept least recently used first and dropped when the
+    terminal size changes.
+    """
+    def __init__(self, colors: Optional[ColorPairs] = None):
+        self.colors = colors if colors is not None else ColorPairs()
+        self.background = None
+        self.parts = []  # (key, cells) of each part of the last frame
+        self.cells = {}  # what is on screen, cells showing the background left out
+        self.layouts = OrderedDict()  # least recently used first
+        self.layout_size = None
 
+    def get_layout(self, layout_args: tuple, build: Callable[..., tuple]) -> tuple:
+        # layout_args starts with (text size, size_x, size_y, ...)
+        if layout_args[1:3] != self.layout_size:
+            self.layouts.clear()
+            self.layout_size = layout_args[1:3]
+        layout = self.layouts.get(layout_args)
+        if layout is None:
+            layout = self.layouts[layout_args] = build(*layout_args)
+            if len(self.layouts) > LAYOUT_CACHE_SIZE:
+                self.layouts.popitem(last=False)
+        else:
+            self.layouts.move_to_end(layout_args)
+        return layout
 
-def display(screen, time_string: str, size: str,
-            size_x: int, size_y: int, color: str,
-            show_seconds: bool, am_pm: str, show_date: bool,
-            colon_on: bool, test_mode: bool, military_time: bool, date: str,
-            bg_color: str, stop_watch: bool, stop_watch_state: str) -> None:
-    time_segments = []
-    for digit in time_string:
-        time_segments.append(get_segments(digit, size))
-    set_color(color, bg_color)
+    def draw(self, screen, background: tuple, runs: list) -> None:
+        self.draw_parts(screen, background, [(runs_of, tuple(runs))])
+
+    def draw_parts(self, screen, background: tuple, parts: list) -> None:
+        """
+        parts are (build, key) pairs, build(*key) gives the runs of the part.
+        A part is only built again when its key differs from the key it had
+        in the last frame, and only the cells it covered or covers now are
+        compared.  Later parts are drawn over earlier ones.
+        """
+        bg_attr = self.colors.get(background[0], background[0])
+        blank = (" ", bg_attr)
+        background += (self.colors.generation,)
+        if background != self.background:
+            screen.clear()
+            fill_background(screen, bg_attr)
+            self.background = background
+            self.parts = []
+            self.cells = {}
+        previous = self.parts + [((), {})] * (len(parts) - len(self.parts))
+        touched = set()
+        for _, old_cells in previous[len(parts):]:  # parts no longer drawn
+            touched.update(old_cells)
+        self.parts = []
+        for (build, key), part in zip(parts, previous):
+            if key == part[0]:
+                self.parts.append(part)
+                continue
+            cells = {}
+            for y, x, text, attr in build(*key):
+                for i, ch in enumerate(text):
+                    cells[(y, x + i)] = (ch, attr)
+            touched.update(part[1])
+            touched.update(cells)
+            self.parts.append((key, cells))
+        changed = {}
+        for pos in touched:
+            value = blank
+            for _, cells in reversed(self.parts):
+                if pos in cells:
+                    value = cells[pos]
+                    break
+            if self.cells.get(pos, blank) != value:
+                changed[pos] = value
+                self.cells[pos] = value
+        for y, x, text, attr in cells_to_runs(changed):
+            screen.addstr(y, x, text, attr)
+
+
+def runs_of(*runs) -> list:
+    return list(runs)
+
+
+def glyph_runs(spans: tuple, y: int, x: int, ch: str, attr: int) -> list:
+    runs = []
+    add_glyph(runs, spans, y, x, ch, attr)
+    return runs
+
+
+def cells_to_runs(cells: dict) -> list:
+    # merge neighbouring cells on the same row and attribute into one run
+    runs = []
+    for (y, x), (ch, attr) in sorted(cells.items()):
+        if runs:
+            last_y, last_x, text, last_attr = runs[-1]
+            if last_y == y and last_x + len(text) == x and last_attr == attr:
+                runs[-1] = (y, last_x, text + ch, attr)
+                continue
+        runs.append((y, x, ch, attr))
+    return runs
+
+
+def add_glyph(runs: list, spans: tuple, y: int, x: int,
+              ch: str, attr: int) -> None:
+    for row, col, length in spans:
+        runs.append((row + y, col + x, ch * length, attr))
+
+
+def raster_runs(spans: tuple, y: int, x: int, attr: int) -> list:
+    return [(row + y, col + x, text, attr) for row, col, text in spans]
+
+
+def layout_frame(size: str, size_x: int, size_y: int, color: str,
+                 show_seconds: bool, am_pm: str, show_date: bool,
+                 colon_on: bool, test_mode: bool, date: str, bg_color: str,
+                 stop_watch: bool, stop_watch_state: str, fraction_length: int,
+                 title: str, digit_attr: int, text_attr: int,
+                 glyphs: str = "digits") -> Tuple[list, list]:
+    """
+    Lay out a frame without its digits.  Returns the digit slots as
+    (index, y, x, glyph size, label) and the runs of everything else,
+    grouped so the colons, AM/PM, date and labels are parts of their own.
+    The label is drawn instead of the digit when not in test mode.
+    glyphs is the style of the digits: "digits" or a RASTER_PIXELS style.
+    """
     size_offset = get_offset(size)
     height, width = get_space_size(size, show_seconds)
+    # fractions of a second use the next smaller glyphs when they fit,
+    # otherwise they are written as text under the seconds
+    fraction_size = get_fraction_size(size)
+    for glyph_size in (size, fraction_size):
+        if isinstance(glyph_size, tuple):
+            add_scaled_glyphs(glyph_size)
+        if glyph_size and glyphs != "digits":
+            add_raster_glyphs(glyph_size, glyphs)
+    if fraction_length and fraction_size:
+        fraction_width = fraction_length * get_offset(fraction_size)
+        if width + fraction_width <= size_x:
+            width += fraction_width
+        else:
+            fraction_size = None
     hc = int((size_y - height) / 2)  # height/vertical center
     w_offset = int((size_x - width) / 2)  # width/horizontal center
-    screen.clear()
-    fill_background(screen, bg_color)
+    slots = []
+    title_runs, colon_runs, seconds_colon_runs, point_runs = [], [], [], []
+    am_pm_runs, date_runs, label_runs = [], [], []
+
+    def add_slot(y: int, x: int, glyph_size: str) -> None:
+        index = len(slots)
+        slots.append((index, y, x, glyph_size, None if test_mode else str(index + 1)))
+
+    def add_colon(runs: list, x: int) -> None:
+        if glyphs == "digits":
+            add_glyph(runs, GLYPH_SPANS[(size, ":")], hc, x, ":", digit_attr)
+        else:
+            runs.extend(raster_runs(RASTER_SPANS[(size, ":", glyphs)], hc, x, digit_attr))
+
     if stop_watch:
         msg = f"Stop Watch  {stop_watch_state}"
-        screen.addstr(hc - 2, int(size_x / 2) - 10, msg, curses.color_pair(2))
-    if military_time or time_string[:1] == "1":
-        d = "1" if not test_mode else time_string[:1]
-        for seg in time_segments[0]:
-            screen.addstr(seg[0] + hc, seg[1] + w_offset, d, curses.color_pair(1))
+        title_runs.append((hc - 2, int(size_x / 2) - 10, msg, text_attr))
+    elif title:
+        title_runs.append((hc - 2, (size_x - len(title)) // 2, title, text_attr))
+    add_slot(hc, w_offset, size)
     w_offset += size_offset
-    d = "2" if not test_mode else time_string[1:2]
-    for seg in time_segments[1]:
-        screen.addstr(seg[0] + hc, seg[1] + w_offset, d, curses.color_pair(1))
+    add_slot(hc, w_offset, size)
     if colon_on:
-        for seg in get_segments(":", size):
-            screen.addstr(seg[0] + hc, seg[1] + w_offset, ":", curses.color_pair(1))
+        add_colon(colon_runs, w_offset)
     w_offset += size_offset + 1
-    d = "3" if not test_mode else time_string[2:3]
-    for seg in time_segments[2]:
-        screen.addstr(seg[0] + hc, seg[1] + w_offset, d, curses.color_pair(1))
+    add_slot(hc, w_offset, size)
     w_offset += size_offset
-    d = "4" if not test_mode else time_string[3:4]
-    for seg in time_segments[3]:
-        screen.addstr(seg[0] + hc, seg[1] + w_offset, d, curses.color_pair(1))
+    add_slot(hc, w_offset, size)
     if show_seconds:
         if colon_on:
-            for seg in get_segments(":", size):
-                screen.addstr(seg[0] + hc, seg[1] + w_offset, ":", curses.color_pair(1))
+            add_colon(seconds_colon_runs, w_offset)
         w_offset += size_offset + 1
-        d = "5" if not test_mode else time_string[4:5]
-        for seg in time_segments[4]:
-            screen.addstr(seg[0] + hc, seg[1] + w_offset, d, curses.color_pair(1))
+        add_slot(hc, w_offset, size)
         w_offset += size_offset
-        d = "6" if not test_mode else time_string[5:]
-        for seg in time_segments[5]:
-            screen.addstr(seg[0] + hc, seg[1] + w_offset, d, curses.color_pair(1))
+        add_slot(hc, w_offset, size)
         w_offset += size_offset
+        if fraction_length and fraction_size:
+            point_x = w_offset - (size_offset - get_glyph_width(size)) // 2 - 1
+            point_runs.append((hc + height - 1, point_x, ".", digit_attr))
+            fraction_height = get_space_size(fraction_size, True)[0]
+            for _ in range(fraction_length):
+                add_slot(hc + height - fraction_height, w_offset, fraction_size)
+                w_offset += get_offset(fraction_size)
+        elif fraction_length:
+            # written as text by display(), the slot only keeps the position
+            slots.append((6, height + hc, w_offset - fraction_length - 1, None, None))
     else:
         w_offset += size_offset
     if am_pm != "":
-        screen.addstr(height + hc, w_offset, am_pm, curses.color_pair(2))
+        am_pm_runs.append((height + hc, w_offset, am_pm, text_attr))
     if show_date:
-        screen.addstr(height + hc, w_offset - 15, date, curses.color_pair(2))
+        date_runs.append((height + hc, w_offset - 15, date, text_attr))
     if test_mode:
-        screen.addstr(0, 0, "test mode", curses.color_pair(2))
-        screen.addstr(1, 0, color, curses.color_pair(2))
-        screen.addstr(2, 0, f"bg={bg_color}", curses.color_pair(2))
-    screen.refresh()
-
-
-def main_stopwatch(screen, args: argparse.Namespace) -> None:
-    curses.curs_set(0)  # Set the cursor to off.
-    screen.timeout(0)  # Turn blocking off for screen.getch()
-    bg_color = args.bg_color
-    digit_color = args.color
-    if args.auto_start:
-        state = "Running"
-        paused = False
-    else:
-        state = "Stopped"  # running, stopped, paused
-        paused = True
-    size_y, size_x = screen.getmaxyx()
-    if size_x >= 90 and size_y >= 22:
-        text_size = "large"
-    elif size_x >= 46 and size_y >= 10:
-        text_size = "medium"
-    elif size_x >= 36 and size_y >= 9:
-        text_size = "small"
-    else:
-        raise CTClockError("Error screen / window is to small")
-    update_screen = True
-    ct_clock = MyTime(True, "00:00:00", True)
-    display_time = ct_clock.get_time("%H%M%S")
-    while True:
-        if curses.is_term_resized(size_y, size_x):
-            size_y, size_x = screen.getmaxyx()
-            if size_x >= 90 and size_y >= 22:
-                text_size = "large"
-            elif size_x >= 46 and size_y >= 12:
-                text_size = "medium"
-            elif size_x >= 36 and size_y >= 9:
-                text_size = "small"
-            else:
-                raise CTClockError("Error screen / window is to small")
-            display(screen, display_time, text_size, size_x, size_y, digit_color, True,
-                    "", False, True, args.test_mode, True, "", bg_color, True, state)
-        if update_screen or not paused and display_time != ct_clock.get_time("%H%M%S"):
-            display_time = ct_clock.get_time("%H%M%S")
-            display(screen, display_time, text_size, size_x, size_y, digit_color, True,
-                    "", False, True, args.test_mode, True, "", bg_color, True, state)
-            update_screen = False
-        ch = screen.getch()
-        if ch in [81, 113]:  # q, Q
-            break
-        elif ch == 103:  # g
-            if paused:
-                ct_clock.unpause()
-                paused = False
-                state = "Running"
-                update_screen = True
+        label_runs.append((0, 0, "test mode", text_attr))
+        label_runs.append((1, 0, color, text_attr))
+        label_runs.append((2, 0, f"bg={bg_color}", text_attr))
+    groups = [title_runs, colon_runs, seconds_colon_runs, point_runs, am_pm_runs,
+              date_runs, label_runs]
+    return slots, [tuple(runs) for runs in groups]
+
+
+def display(screen, time_string: str, size: str,
+            size_x: int, size_y: int, color: str,
+            show_seconds: bool, am_pm: str, show_date: bool,
+            colon_on: bool, test_mode: bool, military_time: bool, date: str,
+            bg_color: str, stop_watch: bool, stop_watch_state: str,
+            renderer: Optional[FrameRenderer] = None, fraction: str = "",
+            title: str = "", glyphs: str = "digits",
+            lines: Sequence[str] = ()) -> None:
+    # lines: text centered under the digits, one line per row, as many as fit
+    if renderer is None:
+        renderer = FrameRenderer(screen_colors(screen))
+    digit_attr = renderer.colors.get(color, color)
+    text_attr = renderer.colors.get(color, bg_color)
+    layout_args = (size, size_x, size_y, color, show_seconds, am_pm, show_date,
+                   colon_on, test_mode, date, bg_color, stop_watch,
+                   stop_watch_state, len(fraction), title, digit_attr, text_attr,
+                   glyphs)
+    slots, groups = renderer.get_layout(layout_args, layout_frame)
+    digits = time_string + fraction
+    # one part per digit slot, keyed on what the slot shows
+    parts = []
+    for index, y, x, glyph_size, label in slots:
+        if glyph_size is None:
+            parts.append((runs_of, ((y, x, "." + fraction, text_attr),)))
+        elif glyphs != "digits" and (index or military_time or digits[0] == "1"):
+            parts.append((raster_runs, (RASTER_SPANS[(glyph_size, digits[index], glyphs)],
+                                        y, x, digit_attr)))
+        elif index or military_time or digits[0] == "1":
+            digit = digits[index]
+            parts.append((glyph_runs, (GLYPH_SPANS[(glyph_size, digit)], y, x,
+                                       label or digit, digit_attr)))
+        else:
+            parts.append((runs_of, ()))
+    for runs in groups:
+        parts.append((runs_of, runs))
+    if lines:
+        height = get_space_size(size, show_seconds)[0]
+        top = (size_y - height) // 2 + height + 1
+        for y, line in zip(range(top, size_y - 1), lines):
+            # a part per row, rebuilt only when the row shows another line
+            parts.append((runs_of, ((y, (size_x - len(line)) // 2, line, text_attr),)))
+    renderer.draw_parts(screen, (bg_color, size_y, size_x), parts)
+    # the frame is sent by the caller's doupdate, once for all its windows
+    screen.noutrefresh()
+
+
+class ProfiledScreen:
+    """
+    Stand-in for the screen of a profiled loop, counting the calls made to
+    the screen and the bytes of text drawn.
+    """
+    def __init__(self, screen, profiler: "Profiler"):
+        self.screen = screen
+        self.profiler = profiler
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        self.profiler.count("addstr")
+        self.profiler.count("addstr bytes", len(text.encode()))
+        self.screen.addstr(y, x, text, attr)
+
+    def doupdate(self) -> None:
+        self.profiler.count("doupdate")
+        doupdate(self.screen)
+
+    def derwin(self, *args) -> "ProfiledScreen":
+        # the draws into subwindows are counted too
+        self.profiler.count("derwin")
+        return ProfiledScreen(self.screen.derwin(*args), self.profiler)
+
+    def __getattr__(self, name: str):
+        value = getattr(self.screen, name)
+        if not callable(value):
+            return value
+
+        def counted(*args):
+            self.profiler.count(name)
+            return value(*args)
+        return counted
+
+
+class Profiler:
+    """
+    Opt-in timings of the main loops, --profile or CT_CLOCK_PROFILE.  Timed
+    calls get a count, a total and a log2 histogram of their durations,
+    and can be streamed as JSON lines.  The loops only wrap their screen,
+    runtime and clock when a profiler is given, so without one they run
+    as before.
+    """
+    def __init__(self, path: Optional[str] = None,
+                 clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.cpu_started = time.process_time()
+        self.timers = {}  # name: [count, total, longest, {log2 microseconds: count}]
+        self.counters = {}
+        self.waited = None  # when the last wait for a key ended
+        self.out = None
+        if path:
+            import json  # only profiling with a file writes json
+
+            self.dumps = json.dumps
+            try:
+                self.out = open(path, "w")
+            except OSError as e:
+                raise CTClockError(f"Can not write the profile to {path}: {e.strerror}")
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name: str, start: float, elapsed: float) -> None:
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0, 0.0, {}]
+        timer[0] += 1
+        timer[1] += elapsed
+        timer[2] = max(timer[2], elapsed)
+        bucket = int(elapsed * 1000000).bit_length()
+        timer[3][bucket] = timer[3].get(bucket, 0) + 1
+        if self.out is not None:
+            self.out.write(self.dumps({"name": name,
+                                       "start": round(start - self.started, 6),
+                                       "us": round(elapsed * 1000000, 1)}) + "\n")
+
+    def timed(self, name: str, func: Callable) -> Callable:
+        def timed_func(*args, **kwargs):
+            start = self.clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, start, self.clock() - start)
+        return timed_func
+
+    def wrap(self, obj, *names: str) -> None:
+        # time the methods of one object, e.g. the get_time of the clock
+        for name in names:
+            setattr(obj, name, self.timed(name, getattr(obj, name)))
+
+    def watch(self, screen, runtime: Runtime) -> ProfiledScreen:
+        """
+        Count the calls to screen and time the waits of runtime.  The time
+        between two waits is the work of one loop iteration.
+        """
+        wait = runtime.wait
+
+        async def timed_wait():
+            start = self.clock()
+            if self.waited is not None:
+                self.record("loop", self.waited, start - self.waited)
+            try:
+                return await wait()
+            finally:
+                self.waited = self.clock()
+                self.record("wait", start, self.waited - start)
+
+        runtime.wait = timed_wait
+        return ProfiledScreen(screen, self)
+
+    def summary(self) -> str:
+        wall = self.clock() - self.started
+        cpu = time.process_time() - self.cpu_started
+        loops = self.timers.get("wait", [0])[0]
+        lines = [f"profile: {wall:.1f} s, cpu {cpu:.2f} s ({cpu / wall:.1%}), "
+                 f"{loops} loop iterations ({loops / wall:.1f}/s)",
+                 f"{'':<18}{'count':>8}{'total ms':>10}{'mean us':>10}"
+                 f"{'p50 us':>9}{'p99 us':>9}{'max us':>10}"]
+        for name, (count, total, longest, buckets) in self.timers.items():
+            percentiles = []
+            for fraction in (0.5, 0.99):
+                seen = 0
+                for bucket in sorted(buckets):
+                    seen += buckets[bucket]
+                    if seen >= fraction * count:
+                        break
+                percentiles.append(f"<{2 ** bucket}")  # log2 bucket upper bound
+            lines.append(f"{name:<18}{count:>8}{total * 1000:>10.1f}"
+                         f"{total / count * 1000000:>10.1f}{percentiles[0]:>9}"
+                         f"{percentiles[1]:>9}{longest * 1000000:>10.1f}")
+        if self.counters:
+            lines.append("screen: " + ", ".join(f"{name} {value}" for name, value
+                                                 in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        # prints the summary, after the terminal is restored
+        if self.out is not None:
+            timers = {name: {"count": count, "total_s": total, "max_s": longest,
+                             "log2_us": buckets}
+                      for name, (count, total, longest, buckets) in self.timers.items()}
+            self.out.write(self.dumps({"name": "summary", "counters": self.counters,
+                                       "timers": timers}) + "\n")
+            self.out.close()
+        print(self.summary(), file=sys.stderr)
+
+
+def start_profiler(args: argparse.Namespace) -> Optional[Profiler]:
+    # --profile [FILE] or CT_CLOCK_PROFILE=FILE, an empty value or 1 for no file
+    if args.command in ("serve", "attach"):
+        return None  # no loop on a screen to time
+    path = args.profile
+    if path is None:
+        path = os.environ.get("CT_CLOCK_PROFILE")
+        if path is None:
+            return None
+    return Profiler(None if path in ("", "1") else path)
+
+
+class KeyTable:
+    """
+    Keys of a mode as rows of (label, key codes, help, action).  The same
+    rows dispatch the keys of the loop and print --list_commands.  An action
+    is called with the mode and the key, and returns True when the frame has
+    to be drawn again, so a burst of keys sets update_screen once.
+    """
+    def __init__(self, rows: Sequence[tuple]):
+        self.rows = rows
+        self.actions = {ch: action for _, codes, _, action in rows for ch in codes}
+
+    def dispatch(self, mode, ch: int) -> None:
+        action = self.actions.get(ch)
+        if action is not None and action(mode, ch):
+            mode.update_screen = True
+
+    def help_lines(self) -> list:
+        lines = []
+        for label, _, text, _ in self.rows:
+            if len(label) < 8:
+                lines.append(f" {label:<8}{text}")
             else:
-                ct_clock.pause()
-                paused = True
-                state = "Paused"
-                update_screen = True
-        elif ch == 104:  # h
-            update_screen = True
-            paused = True
-            state = "Stopped"
-            display_time = ct_clock.get_time("%H%M%S")
-            ct_clock.reset()
-        if ch in CHAR_CODES_COLOR.keys():
-            digit_color = CHAR_CODES_COLOR[ch]
-            display(screen, display_time, text_size, size_x, size_y, digit_color, True,
-                    "", False, True, args.test_mode, True, "", bg_color, True, state)
-
-
-def main_clock(screen, args: argparse.Namespace) -> None:
-    static_color = args.color
-    show_seconds = args.no_seconds
-    military_time = args.military_time
-    mode = args.mode
-    cycle_timing = args.cycle_timing
-    show_date = args.show_date
-    blink_colon = args.blink_colon
-    no_colon = args.no_colon
-    bg_color = args.bg_color
-    curses.curs_set(0)  # Set the cursor to off.
-    screen.timeout(0)  # Turn blocking off for screen.getch()
-    ct_time = MyTime(args.test_mode, args.test_date + " " + args.test_time, True)
-    update_screen = True
+                lines.append(f" {label}")
+                lines.append(f"{'':9}{text}")
+        return lines
+
+
+class StopWatchMode:
+    """
+    The stop watch between frames, run by Runtime.  A frame is drawn when
+    the time shown changed or a key changed what is shown.
+    """
+    def __init__(self, screen, args: argparse.Namespace,
+                 profiler: Optional[Profiler] = None):
+        self.screen = screen
+        self.args = args
+        self.precision = args.precision
+        self.stop_watch = StopWatch()
+        # one tick per displayed step: every second, tenth or hundredth
+        self.scheduler = TickScheduler(10 ** -self.precision, self.stop_watch.get_elapsed)
+        self.draw_frame = display
+        if profiler is not None:
+            profiler.wrap(self.stop_watch, "get_time_fraction")
+            self.draw_frame = profiler.timed("display", display)
+        self.renderer = FrameRenderer(screen_colors(screen))
+        self.bg_color = args.bg_color
+        self.digit_color = args.color
+        if args.auto_start:
+            self.state = "Running"
+            self.stop_watch.start()
+        else:
+            self.state = "Stopped"  # running, stopped, paused
+        # the title and the state go above the digits, the fraction below
+        self.size_y, self.size_x, self.text_size = screen_layout(screen, 2, args.scale)
+        self.laps = open_laps(args.laps) if args.laps else LapStore()
+        self.lap_lines = []  # the latest laps, newest first, under the digits
+        self.update_screen = True
+        self.done = False
+        self.shown = None  # time and fraction on screen
+
+    @property
+    def idle(self) -> bool:
+        return not self.stop_watch.running
+
+    def draw(self) -> None:
+        current = self.stop_watch.get_time_fraction(self.precision)
+        if self.update_screen or self.shown != current:
+            self.shown = display_time, fraction = current
+            self.draw_frame(self.screen, display_time, self.text_size, self.size_x,
+                            self.size_y, self.digit_color, True, "", False, True,
+                            self.args.test_mode, True, "", self.bg_color, True,
+                            self.state, self.renderer, fraction, glyphs=self.args.glyphs,
+                            lines=self.lap_lines)
+            doupdate(self.screen)
+            self.update_screen = False
+
+    def resize(self) -> None:
+        self.size_y, self.size_x, self.text_size = screen_layout(self.screen, 2,
+                                                                 self.args.scale)
+        self.lap_lines = self.laps.latest_lines(self.size_y)
+        self.update_screen = True
+
+    def key(self, ch: int) -> bool:
+        STOP_WATCH_KEYS.dispatch(self, ch)
+        return self.done
+
+    def quit(self, ch: int) -> bool:
+        self.done = True
+        return False
+
+    def start_pause(self, ch: int) -> bool:
+        if self.stop_watch.running:
+            self.stop_watch.pause()
+            self.state = "Paused"
+        else:
+            self.stop_watch.start()
+            self.state = "Running"
+        return True
+
+    def reset(self, ch: int) -> bool:
+        self.stop_watch.reset()
+        self.laps.clear()
+        self.lap_lines = []
+        self.state = "Stopped"
+        return True
+
+    def lap(self, ch: int) -> bool:
+        if not self.stop_watch.running:
+            return False
+        self.laps.add(self.stop_watch.get_elapsed_ns())
+        self.lap_lines = self.laps.latest_lines(self.size_y)
+        return True
+
+    def set_color(self, ch: int) -> bool:
+        self.digit_color = CHAR_CODES_COLOR[ch]
+        return True
+
+    def close(self) -> None:
+        self.laps.close()
+
+
+def main_stopwatch(screen, args: argparse.Namespace,
+                   profiler: Optional[Profiler] = None) -> None:
+    runtime = Runtime(screen)
+    if profiler is not None:
+        screen = profiler.watch(screen, runtime)
+    runtime.run(StopWatchMode(screen, args, profiler))
+
+
+SELECT_COLOR = ("r,t,y,u,i,o,p,[", tuple(CHAR_CODES_COLOR),
+                "Select color: Red, Green, Blue, Yellow, Magenta, Cyan, White")
+SELECT_BG_COLOR = ("R,T,Y,U,I,O,P,{", tuple(CHAR_CODES_COLOR_BG),
+                   "Change background colors: Red, Green, Blue, Yellow, Magenta, Cyan, "
+                   "White, Black")
+STOP_WATCH_KEYS = KeyTable([
+    ("q  Q", (113, 81), "Quit", StopWatchMode.quit),
+    ("g", (103,), "Start or pause stop watch", StopWatchMode.start_pause),
+    ("h", (104,), "Reset stop watch to 00:00:00", StopWatchMode.reset),
+    ("l", (108,), "Record a lap while running", StopWatchMode.lap),
+    SELECT_COLOR + (StopWatchMode.set_color,),
+])
+
+
+class TimerLayout:
+    """
+    Windows of the timer screen: the focused countdown in seven segments
+    above, the countdowns after it one per line below, as many as fit.
+    """
+    def __init__(self, screen, count: int, colors: ColorPairs, scale: bool = False):
+        size_y, self.size_x = screen.getmaxyx()
+        self.list_rows = min(count - 1, size_y // 3)
+        self.size_y = size_y - self.list_rows
+        # the name and the state go above the digits
+        self.text_size = get_text_size(self.size_x, self.size_y, 2, scale)
+        self.window = screen.derwin(self.size_y, self.size_x, 0, 0)
+        self.renderer = FrameRenderer(colors)
+        self.list_window = None
+        if self.list_rows:
+            self.list_window = screen.derwin(self.list_rows, self.size_x, self.size_y, 0)
+            self.list_renderer = FrameRenderer(colors)
+
+    def visible(self, focus: int, count: int) -> list:
+        # the focused countdown first, then the ones after it
+        others = [(focus + i) % count for i in range(1, count)]
+        if len(others) > self.list_rows:
+            others = others[:self.list_rows - 1]  # the last row says how many more
+        return [focus] + others
+
+    def draw(self, countdowns: Sequence[Countdown], visible: list, now: int,
+             color: str, bg_color: str, test_mode: bool, glyphs: str) -> None:
+        focused = countdowns[visible[0]]
+        display(self.window, focused.get_time(now), self.text_size, self.size_x,
+                self.size_y, color, True, "", False, True, test_mode, True, "",
+                bg_color, False, "", self.renderer,
+                title=f"{focused.name}  {focused.state}", glyphs=glyphs)
+        if self.list_window is None:
+            return
+        attr = self.list_renderer.colors.get(color, bg_color)
+        width = self.size_x - 2  # never up to the bottom right cell
+        runs = []
+        for row, index in enumerate(visible[1:]):
+            countdown = countdowns[index]
+            hhmmss = countdown.get_time(now)
+            line = (f"{countdown.name[:20]:<20}  {hhmmss[:2]}:{hhmmss[2:4]}:"
+                    f"{hhmmss[4:]}  {countdown.state}")
+            runs.append((row, 1, line[:width], attr))
+        hidden = len(countdowns) - len(visible)
+        if hidden:
+            runs.append((self.list_rows - 1, 1, f"... {hidden} more"[:width], attr))
+        self.list_renderer.draw(self.list_window, (bg_color, self.list_rows, self.size_x),
+                                runs)
+        self.list_window.noutrefresh()
+
+
+def timer_delay_ms(countdowns: Sequence[Countdown], visible: list,
+                   queue: TimerQueue, now: int) -> Optional[int]:
+    """
+    Milliseconds until the next expiry or the next second shown by a
+    visible running countdown, None while nothing runs.
+    """
+    delays = []
+    deadline = queue.next_deadline()
+    if deadline is not None:
+        delays.append(deadline - now)
+    for index in visible:
+        if countdowns[index].running:
+            delays.append(countdowns[index].get_left_ns(now) % 1000000000 or 1000000000)
+    if not delays:
+        return None
+    return -(-min(delays) // 1000000)
+
+
+class TimerMode:
+    """
+    The countdowns of the timer subcommand between frames, run by Runtime.
+    It wakes at the next expiry or the next second shown by a visible
+    running countdown, and sleeps while none runs.
+    """
+    def __init__(self, screen, args: argparse.Namespace,
+                 profiler: Optional[Profiler] = None,
+                 clock: Callable[[], int] = time.monotonic_ns):
+        self.screen = screen
+        self.args = args
+        self.clock = clock
+        self.scheduler = self  # timeout_ms() comes from the countdowns
+        self.countdowns = [
+            Countdown(name or f"Timer {i + 1}", seconds * 1000000000, clock)
+            for i, (name, seconds) in enumerate(args.timers)]
+        self.queue = TimerQueue(self.countdowns)
+        self.colors = screen_colors(screen)
+        self.digit_color = args.color
+        self.bg_color = args.bg_color
+        self.focus = 0
+        if args.auto_start:
+            self.start_all(97)
+        self.layout = TimerLayout(screen, len(self.countdowns), self.colors, args.scale)
+        self.draw_frame = TimerLayout.draw
+        if profiler is not None:
+            self.draw_frame = profiler.timed("display", TimerLayout.draw)
+        self.visible = [0]
+        self.delay_ms = None
+        self.update_screen = True
+        self.done = False
+        self.shown = None
+
+    @property
+    def idle(self) -> bool:
+        return self.delay_ms is None
+
+    def timeout_ms(self) -> int:
+        return self.delay_ms
+
+    def draw(self) -> None:
+        now = self.clock()
+        expired = self.queue.pop_expired(now)
+        if expired:
+            self.focus = expired[-1]  # show the timer that just finished
+            bell(self.screen)
+        countdowns = self.countdowns
+        self.visible = visible = self.layout.visible(self.focus, len(countdowns))
+        current = [(countdowns[i].get_time(now), countdowns[i].state) for i in visible]
+        if self.update_screen or current != self.shown:
+            self.shown = current
+            self.draw_frame(self.layout, countdowns, visible, now, self.digit_color,
+                            self.bg_color, self.args.test_mode, self.args.glyphs)
+            doupdate(self.screen)
+            self.update_screen = False
+        self.delay_ms = timer_delay_ms(countdowns, visible, self.queue, now)
+
+    def resize(self) -> None:
+        self.screen.clear()
+        self.layout = TimerLayout(self.screen, len(self.countdowns), self.colors,
+                                  self.args.scale)
+        self.update_screen = True
+
+    def key(self, ch: int) -> bool:
+        TIMER_KEYS.dispatch(self, ch)
+        return self.done
+
+    def quit(self, ch: int) -> bool:
+        self.done = True
+        return False
+
+    def start_pause(self, ch: int) -> bool:
+        focused = self.countdowns[self.focus]
+        if focused.running:
+            focused.pause()
+        else:
+            if focused.state == "Done":
+                focused.reset()
+            focused.start()
+            self.queue.push(self.focus)
+        return True
+
+    def reset(self, ch: int) -> bool:
+        self.countdowns[self.focus].reset()
+        return True
+
+    def start_all(self, ch: int) -> bool:
+        for index, countdown in enumerate(self.countdowns):
+            if countdown.state in ("Stopped", "Paused"):
+                countdown.start()
+                self.queue.push(index)
+        return True
+
+    def next_timer(self, ch: int) -> bool:
+        step = 1 if ch == 110 else -1  # n or N
+        self.focus = (self.focus + step) % len(self.countdowns)
+        return True
+
+    def set_color(self, ch: int) -> bool:
+        self.digit_color = CHAR_CODES_COLOR[ch]
+        return True
+
+    def set_bg_color(self, ch: int) -> bool:
+        self.bg_color = CHAR_CODES_COLOR_BG[ch]
+        return True
+
+    def close(self) -> None:
+        self.screen.erase()
+        self.screen.refresh()
+
+
+def main_timer(screen, args: argparse.Namespace,
+               profiler: Optional[Profiler] = None) -> None:
+    runtime = Runtime(screen)
+    if profiler is not None:
+        screen = profiler.watch(screen, runtime)
+    runtime.run(TimerMode(screen, args, profiler))
+
+
+TIMER_KEYS = KeyTable([
+    ("q  Q", (113, 81), "Quit", TimerMode.quit),
+    ("g", (103,), "Start or pause the timer shown", TimerMode.start_pause),
+    ("h", (104,), "Reset the timer shown", TimerMode.reset),
+    ("a", (97,), "Start all stopped and paused timers", TimerMode.start_all),
+    ("n  N", (110, 78), "Show the next or previous timer", TimerMode.next_timer),
+    SELECT_COLOR + (TimerMode.set_color,),
+    SELECT_BG_COLOR + (TimerMode.set_bg_color,),
+])
+
+
+class DashboardPane:
+    """
+    One time zone of the dashboard, drawn into its own subwindow.  Panes
+    share the color pairs and the glyph tables, each keeps its own frame.
+    """
+    def __init__(self, screen, zone_time: ZoneTime, y: int, x: int,
+                 height: int, width: int, colors: ColorPairs, scale: bool = False):
+        self.zone_time = zone_time
+        self.height = height
+        self.width = width
+        # the title goes above the digits and AM/PM right of the seconds
+        self.text_size = get_text_size(width - 2, height, header_rows=2, scale=scale)
+        self.window = screen.derwin(height, width, y, x)
+        self.renderer = FrameRenderer(colors)
+
+    def draw(self, second: int, color: str, military_time: bool,
+             bg_color: str, test_mode: bool, glyphs: str = "digits") -> None:
+        time_string, am_pm = self.zone_time.get_time(second, military_time)
+        display(self.window, time_string, self.text_size, self.width, self.height,
+                color, True, am_pm, False, True, test_mode, military_time, "",
+                bg_color, False, "", self.renderer, title=self.zone_time.name,
+                glyphs=glyphs)
+
+
+def layout_panes(screen, zones: list, colors: ColorPairs, scale: bool = False) -> list:
+    # near square grid, filled row by row
     size_y, size_x = screen.getmaxyx()
-    if size_x >= 90 and size_y >= 20:
-        text_size = "large"
-    elif size_x >= 46 and size_y >= 10:
-        text_size = "medium"
-    elif size_x >= 36 and size_y >= 8:
-        text_size = "small"
+    columns = 1
+    while columns * columns < len(zones):
+        columns += 1
+    rows = -(-len(zones) // columns)
+    height = size_y // rows
+    width = size_x // columns
+    panes = []
+    for i, zone_time in enumerate(zones):
+        row, column = divmod(i, columns)
+        panes.append(DashboardPane(screen, zone_time, row * height, column * width,
+                                   height, width, colors, scale))
+    return panes
+
+
+class DashboardMode:
+    """
+    The time zone panes of the dashboard between frames, run by Runtime.
+    All panes are drawn once per second and go out in one terminal update.
+    """
+    idle = False
+
+    def __init__(self, screen, args: argparse.Namespace,
+                 profiler: Optional[Profiler] = None):
+        self.screen = screen
+        self.args = args
+        self.zones = load_zones(args.zones)
+        self.clock = get_clock(args, utc=True)  # the zones are told apart from UTC
+        self.scheduler = TickScheduler(clock=self.clock)
+        self.colors = screen_colors(screen)
+        self.color = args.color
+        self.bg_color = args.bg_color
+        self.military_time = args.military_time
+        self.panes = layout_panes(screen, self.zones, self.colors, args.scale)
+        self.draw_pane = DashboardPane.draw
+        if profiler is not None:
+            self.draw_pane = profiler.timed("display", DashboardPane.draw)
+        self.update_screen = True
+        self.done = False
+        self.displayed = None
+
+    def draw(self) -> None:
+        second = int(self.clock())
+        if self.update_screen or second != self.displayed:
+            self.displayed = second
+            for pane in self.panes:
+                self.draw_pane(pane, second, self.color, self.military_time,
+                               self.bg_color, self.args.test_mode, self.args.glyphs)
+            doupdate(self.screen)  # all panes go out in one terminal update
+            self.update_screen = False
+
+    def resize(self) -> None:
+        self.screen.clear()
+        self.panes = layout_panes(self.screen, self.zones, self.colors, self.args.scale)
+        self.update_screen = True
+
+    def key(self, ch: int) -> bool:
+        DASHBOARD_KEYS.dispatch(self, ch)
+        return self.done
+
+    def quit(self, ch: int) -> bool:
+        self.done = True
+        return False
+
+    def toggle_military_time(self, ch: int) -> bool:
+        self.military_time = not self.military_time
+        return True
+
+    def set_color(self, ch: int) -> bool:
+        self.color = CHAR_CODES_COLOR[ch]
+        return True
+
+    def set_bg_color(self, ch: int) -> bool:
+        self.bg_color = CHAR_CODES_COLOR_BG[ch]
+        return True
+
+    def close(self) -> None:
+        self.screen.erase()
+        self.screen.refresh()
+
+
+def main_dashboard(screen, args: argparse.Namespace,
+                   profiler: Optional[Profiler] = None) -> None:
+    runtime = Runtime(screen)
+    if profiler is not None:
+        screen = profiler.watch(screen, runtime)
+    runtime.run(DashboardMode(screen, args, profiler))
+
+
+DASHBOARD_KEYS = KeyTable([
+    ("q  Q", (113, 81), "Quit", DashboardMode.quit),
+    ("m", (109,), "Toggle military time", DashboardMode.toggle_military_time),
+    SELECT_COLOR + (DashboardMode.set_color,),
+    SELECT_BG_COLOR + (DashboardMode.set_bg_color,),
+])
+
+
+def default_socket_path() -> str:
+    import tempfile
+
+    return os.path.join(tempfile.gettempdir(), f"ct_clock-{os.getuid()}.sock")
+
+
+class RenderGroup:
+    """
+    Viewers of the clock server with the same terminal size.  A frame is
+    rendered once for the whole group and the same bytes go to every viewer.
+    """
+    def __init__(self, size_y: int, size_x: int, scale: bool = False):
+        self.size_y = size_y
+        self.size_x = size_x
+        self.text_size = get_text_size(size_x, size_y, scale=scale)
+        self.clients = []
+        self.dropped = set()  # viewers that could not keep up or went away
+        self.screen = AnsiScreen(size_y, size_x, self.send)
+        self.renderer = FrameRenderer(ColorPairs(self.screen))
+
+    def add(self, client) -> None:
+        self.clients.append(client)
+        # a new viewer has an empty terminal, the next frame is drawn in full
+        self.renderer = FrameRenderer(self.renderer.colors)
+
+    def send(self, data: bytes) -> None:
+        for client in self.clients:
+            try:
+                client.sendall(data)
+            except OSError:
+                self.dropped.add(client)
+
+    def draw(self, args: argparse.Namespace, time_string: str, am_pm: str,
+             date: str, colon_on: bool) -> None:
+        display(self.screen, time_string, self.text_size, self.size_x, self.size_y,
+                args.color, args.no_seconds, am_pm, args.show_date, colon_on,
+                args.test_mode, args.military_time, date, args.bg_color, False, "",
+                self.renderer, glyphs=args.glyphs)
+        self.screen.doupdate()
+
+
+def main_server(args: argparse.Namespace) -> None:
+    import socket
+
+    path = args.socket or default_socket_path()
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listener.connect(path)
+    except OSError:
+        pass  # nobody listening, a socket file left behind can go
     else:
-        raise CTClockError("Error screen / window is to small")
-
-    time_format = "%H%M%S" if military_time else "%I%M%S"
-    date_format_pointer = 0
-
-    colon_on = False if no_colon else True
-    cycle_count = 0
-    displayed = ct_time.get_time(time_format)
-    while True:
-        if curses.is_term_resized(size_y, size_x):
-            size_y, size_x = screen.getmaxyx()
-            update_screen = True
-            if size_x >= 90 and size_y >= 20:
-                text_size = "large"
-            elif size_x >= 46 and size_y >= 10:
-                text_size = "medium"
-            elif size_x >= 36 and size_y >= 8:
-                text_size = "small"
-            else:
-                raise CTClockError("Error screen / window is to small")
-        if update_screen or ct_time.get_time(time_format) != displayed:
-            old_displayed = displayed
-            displayed = ct_time.get_time(time_format)
-            if blink_colon:
-                colon_on = not colon_on
-            if military_time:
+        listener.close()
+        raise CTClockError(f"A clock server is already running on {path}")
+    with contextlib.suppress(FileNotFoundError):
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            listener.close()
+            raise CTClockError(f"{path} exists and is not a socket")
+        os.unlink(path)
+    listener.bind(path)
+    listener.listen()
+    clock = get_clock(args)
+    ct_time = MyTime(clock)
+    scheduler = TickScheduler(clock=clock)
+    time_format = "%H%M%S" if args.military_time else "%I%M%S"
+    colon_on = not args.no_colon
+    groups = {}  # (rows, columns): RenderGroup
+    viewers = {}  # socket: (rows, columns) or None while its size is unknown
+    pending = {}  # socket: bytes received after the last complete line
+
+    def leave_group(client) -> None:
+        key = viewers[client]
+        if key in groups:
+            groups[key].clients.remove(client)
+            if not groups[key].clients:
+                del groups[key]
+        viewers[client] = None
+
+    def drop(client) -> None:
+        if client in viewers:
+            leave_group(client)
+            del viewers[client]
+            del pending[client]
+            client.close()
+
+    displayed = None
+    try:
+        while True:
+            current = ct_time.get_time(time_format)
+            if current != displayed:
+                displayed = current
+                if args.blink_colon:
+                    colon_on = not colon_on
+                am_pm = "" if args.military_time else ct_time.get_time("%p")
+                date = ct_time.get_date(DATE_FORMATS[0])
+                for group in groups.values():
+                    group.draw(args, displayed, am_pm, date, colon_on)
+            for group in list(groups.values()):
+                for client in group.dropped:
+                    drop(client)
+                group.dropped.clear()
+            timeout = real_seconds(clock, scheduler.timeout_ms() / 1000)
+            readable = select.select([listener, *viewers], [], [], timeout)[0]
+            for client in readable:
+                if client is listener:
+                    client, _ = listener.accept()
+                    client.setblocking(False)  # a stuck viewer is dropped
+                    viewers[client] = None
+                    pending[client] = b""
+                    continue
+                try:
+                    data = client.recv(1024)
+                except OSError:
+                    data = b""
+                if not data:
+                    drop(client)
+                    continue
+                # viewers send their terminal size as "rows columns" lines
+                *lines, pending[client] = (pending[client] + data).split(b"\n")
+                if len(pending[client]) > VIEWER_LINE_MAX:
+                    drop(client)
+                    continue
+                if not lines:
+                    continue
+                try:
+                    rows, columns = (int(n) for n in lines[-1].split())
+                except ValueError:
+                    drop(client)
+                    continue
+                leave_group(client)
+                group = groups.get((rows, columns))
+                if group is None:
+                    try:
+                        group = RenderGroup(rows, columns, args.scale)
+                    except CTClockError as e:
+                        with contextlib.suppress(OSError):
+                            client.sendall(f"\x1b[0m\x1b[H\x1b[2J{e}".encode())
+                        continue
+                    groups[(rows, columns)] = group
+                viewers[client] = (rows, columns)
+                group.add(client)
+                group.draw(args, displayed, am_pm, date, colon_on)
+    finally:
+        for client in viewers:
+            client.close()
+        listener.close()
+        os.unlink(path)
+
+
+def main_attach(args: argparse.Namespace) -> None:
+    import shutil
+    import socket
+
+    path = args.socket or default_socket_path()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.connect(path)
+    except OSError:
+        raise CTClockError(f"No clock server running on {path}")
+    stdin = terminal_stdin()
+    out = sys.stdout.buffer
+    with raw_terminal(stdin) as wakeup, server:
+        size = None
+        partial = b""  # an escape sequence cut off by the last read
+        while True:
+            columns, rows = shutil.get_terminal_size()
+            if (rows, columns) != size:
+                size = rows, columns
+                server.sendall(f"{rows} {columns}\n".encode())
+            fds = [fd for fd in (server, stdin, wakeup) if fd is not None]
+            readable = select.select(fds, [], [])[0]
+            if wakeup in readable:
+                os.read(wakeup, 64)
+            if stdin in readable:
+                keys, partial = parse_keys(partial + os.read(stdin, 64))
+                if {81, 113} & set(keys):  # q, Q
+                    break
+            if server in readable:
+                data = server.recv(65536)
+                if not data:
+                    break
+                out.write(data)
+                out.flush()
+
+
+class ClockMode:
+    """
+    The clock between frames, run by Runtime.  A frame is drawn when the
+    time shown changed or a key changed a setting.
+    """
+    idle = False
+
+    def __init__(self, screen, args: argparse.Namespace,
+                 profiler: Optional[Profiler] = None,
+                 clock: Optional[Callable[[], float]] = None):
+        # clock: time.time or the VirtualClock of test mode unless given
+        self.screen = screen
+        self.args = args
+        self.clock = get_clock(args) if clock is None else clock
+        self.scheduler = TickScheduler(clock=self.clock)
+        self.static_color = args.color
+        self.show_seconds = args.no_seconds
+        self.military_time = args.military_time
+        self.mode = args.mode
+        self.cycle_timing = args.cycle_timing
+        self.show_date = args.show_date
+        self.blink_colon = args.blink_colon
+        self.bg_color = args.bg_color
+        self.ct_time = MyTime(self.clock)
+        self.draw_frame = display
+        if profiler is not None:
+            profiler.wrap(self.ct_time, "get_time", "get_date")
+            self.draw_frame = profiler.timed("display", display)
+        self.renderer = FrameRenderer(screen_colors(screen))
+        self.update_screen = True
+        self.done = False
+        self.size_y, self.size_x, self.text_size = screen_layout(screen, scale=args.scale)
+
+        self.time_format = "%H%M%S" if self.military_time else "%I%M%S"
+        self.date_format_pointer = 0
+
+        self.colon_on = False if args.no_colon else True
+        self.cycle_count = 0
+        self.displayed = self.ct_time.get_time(self.time_format)
+
+    def draw(self) -> None:
+        current = self.ct_time.get_time(self.time_format)
+        if self.update_screen or current != self.displayed:
+            old_displayed = self.displayed
+            self.displayed = displayed = current
+            if self.blink_colon:
+                self.colon_on = not self.colon_on
+            if self.military_time:
                 am_pm = ""
             else:
-                am_pm = ct_time.get_time("%p")
-            if mode == 0:
-                color = static_color
-            elif mode == 1:
-                if cycle_timing == 1:
-                    if cycle_count == 6:
-                        cycle_count = 0
+                am_pm = self.ct_time.get_time("%p")
+            if self.mode == 0:
+                color = self.static_color
+            elif self.mode == 1:
+                if self.cycle_timing == 1:
+                    if self.cycle_count == 6:
+                        self.cycle_count = 0
                     else:
-                        cycle_count += 1
-                elif cycle_timing == 2 and displayed[-2:] == "00":
-                    if cycle_count == 6:
-                        cycle_count = 0
+                        self.cycle_count += 1
+                elif self.cycle_timing == 2 and displayed[-2:] == "00":
+                    if self.cycle_count == 6:
+                        self.cycle_count = 0
                     else:
-                        cycle_count += 1
-                elif cycle_timing == 3 and old_displayed[0:2] != displayed[0:2]:
-                    if cycle_count == 6:
-                        cycle_count = 0
+                        self.cycle_count += 1
+                elif self.cycle_timing == 3 and old_displayed[0:2] != displayed[0:2]:
+                    if self.cycle_count == 6:
+                        self.cycle_count = 0
                     else:
-                        cycle_count += 1
-                color = COLORS[cycle_count]
-            else:
-                color = static_color
-            date = ct_time.get_date(DATE_FORMATS[date_format_pointer])
-            display(screen, displayed, text_size, size_x, size_y,
-                    color, show_seconds, am_pm, show_date, colon_on,
-                    args.test_mode, military_time, date, bg_color, False, "")
-            update_screen = False
-        ch = screen.getch()
-        if args.screensaver and ch != -1:
-            break
-        if ch in [81, 113]:  # q, Q
-            break
-        if mode == 0 and ch in CHAR_CODES_COLOR.keys():
-            static_color = CHAR_CODES_COLOR[ch]
-            update_screen = True
-        if ch in CHAR_CODES_COLOR_BG.keys():
-            bg_color = CHAR_CODES_COLOR_BG[ch]
-            update_screen = True
-        if ch == 99:  # c
-            if mode == 1:
-                mode = 0
-            else:
-                mode += 1
-            update_screen = True
-        if ch == 115:  # s
-            show_seconds = not show_seconds
-            update_screen = True
-        elif ch == 98:  # b
-            if blink_colon:
-                blink_colon = False
-                colon_on = True
-            else:
-                blink_colon = True
-        if ch == 109:  # m
-            if military_time:
-                time_format = "%I%M%S"
-                military_time = False
+                        self.cycle_count += 1
+                color = COLORS[self.cycle_count]
             else:
-                time_format = "%H%M%S"
-                military_time = True
-            update_screen = True
-        elif ch == 101:  # e
-            show_date = not show_date  # flips between True and False
-            update_screen = True
-        elif ch == 69 and show_date:  # E
-            if date_format_pointer == len(DATE_FORMATS) - 1:
-                date_format_pointer = 0
-            else:
-                date_format_pointer += 1
-            update_screen = True
-        elif ch == 100:  # d
-            time_format = "%I%M%S"
-            military_time = False
-            show_date = False
-            date_format_pointer = 0
-            show_seconds = True
-            mode = 0
-            static_color = "white"
-            blink_colon = False
-            colon_on = True
-            bg_color = "black"
-            update_screen = True
-        elif ch == 110:  # n
-            colon_on = not colon_on
-            blink_colon = False
-            update_screen = True
-        if ch == 49:  # 1
-            cycle_timing = 1
-        elif ch == 50:  # 2
-            cycle_timing = 2
-        elif ch == 51:  # 3
-            cycle_timing = 3
-
-    screen.erase()
-    screen.refresh()
+                color = self.static_color
+            date = self.ct_time.get_date(DATE_FORMATS[self.date_format_pointer])
+            self.draw_frame(self.screen, displayed, self.text_size, self.size_x,
+                            self.size_y, color, self.show_seconds, am_pm, self.show_date,
+                            self.colon_on, self.args.test_mode, self.military_time, date,
+                            self.bg_color, False, "", self.renderer,
+                            glyphs=self.args.glyphs)
+            doupdate(self.screen)
+            self.update_screen = False
+
+    def resize(self) -> None:
+        self.size_y, self.size_x, self.text_size = screen_layout(self.screen,
+                                                                 scale=self.args.scale)
+        self.update_screen = True
+
+    def key(self, ch: int) -> bool:
+        if self.args.screensaver:
+            return True  # any key, resizes do not get here
+        CLOCK_KEYS.dispatch(self, ch)
+        return self.done
+
+    def quit(self, ch: int) -> bool:
+        self.done = True
+        return False
+
+    def next_mode(self, ch: int) -> bool:
+        if self.mode == 1:
+            self.mode = 0
+        else:
+            self.mode += 1
+        return True
+
+    def toggle_seconds(self, ch: int) -> bool:
+        self.show_seconds = not self.show_seconds
+        return True
+
+    def toggle_date(self, ch: int) -> bool:
+        self.show_date = not self.show_date  # flips between True and False
+        return True
+
+    def next_date_format(self, ch: int) -> bool:
+        if not self.show_date:
+            return False
+        if self.date_format_pointer == len(DATE_FORMATS) - 1:
+            self.date_format_pointer = 0
+        else:
+            self.date_format_pointer += 1
+        return True
+
+    def toggle_blink(self, ch: int) -> bool:
+        # takes effect with the next second
+        if self.blink_colon:
+            self.blink_colon = False
+            self.colon_on = True
+        else:
+            self.blink_colon = True
+        return False
+
+    def toggle_military_time(self, ch: int) -> bool:
+        if self.military_time:
+            self.time_format = "%I%M%S"
+            self.military_time = False
+        else:
+            self.time_format = "%H%M%S"
+            self.military_time = True
+        return True
+
+    def toggle_colon(self, ch: int) -> bool:
+        self.colon_on = not self.colon_on
+        self.blink_colon = False
+        return True
+
+    def reset_settings(self, ch: int) -> bool:
+        self.time_format = "%I%M%S"
+        self.military_time = False
+        self.show_date = False
+        self.date_format_pointer = 0
+        self.show_seconds = True
+        self.mode = 0
+        self.static_color = "white"
+        self.blink_colon = False
+        self.colon_on = True
+        self.bg_color = "black"
+        return True
+
+    def set_cycle_timing(self, ch: int) -> bool:
+        self.cycle_timing = ch - 48  # 1, 2 or 3
+        return False
+
+    def set_color(self, ch: int) -> bool:
+        if self.mode != 0:
+            return False  # the colors cycle
+        self.static_color = CHAR_CODES_COLOR[ch]
+        return True
+
+    def set_bg_color(self, ch: int) -> bool:
+        self.bg_color = CHAR_CODES_COLOR_BG[ch]
+        return True
+
+    def close(self) -> None:
+        self.screen.erase()
+        self.screen.refresh()
+
+
+def main_clock(screen, args: argparse.Namespace,
+               profiler: Optional[Profiler] = None) -> None:
+    runtime = Runtime(screen)
+    if profiler is not None:
+        screen = profiler.watch(screen, runtime)
+    runtime.run(ClockMode(screen, args, profiler))
+
+
+CLOCK_KEYS = KeyTable([
+    ("q  Q", (113, 81), "Quit", ClockMode.quit),
+    ("c", (99,), "Change color mode", ClockMode.next_mode),
+    ("s", (115,), "Toggle show seconds", ClockMode.toggle_seconds),
+    ("e", (101,), "Toggle show date", ClockMode.toggle_date),
+    ("E", (69,), "Cycle date formats", ClockMode.next_date_format),
+    ("b", (98,), "Toggle blink colon", ClockMode.toggle_blink),
+    ("m", (109,), "Toggle military time", ClockMode.toggle_military_time),
+    ("n", (110,), "Toggle colon off and on", ClockMode.toggle_colon),
+    ("d", (100,), "Reset setting to defaults", ClockMode.reset_settings),
+    ("1,2,3", (49, 50, 51),
+     "Color cycle timing 1-every second, 2-every minute, 3-every hour",
+     ClockMode.set_cycle_timing),
+    SELECT_COLOR + (ClockMode.set_color,),
+    SELECT_BG_COLOR + (ClockMode.set_bg_color,),
+])
 
 
 def display_running_commands() -> None:
     print("Commands available during run time:")
-    print(" q  Q    Quit")
-    print(" c       Change color mode")
-    print(" s       Toggle show seconds")
-    print(" e       Toggle show date")
-    print(" E       Cycle date formats")
-    print(" b       Toggle blink colon")
-    print(" m       Toggle military time")
-    print(" n       Toggle colon off and on")
-    print(" d       Reset setting to defaults")
-    print(" 1,2,3   Color cycle timing 1-every second, 2-every minute, 3-every hour")
-    print(" r,t,y,u,i,o,p,[")
-    print("         Select color: Red, Green, Blue, Yellow, Magenta, Cyan, White")
-    print(" R,T,Y,U,I,O,P,{")
-    print("         Change background colors: Red, Green, Blue, Yellow, Magenta, "
-          "Cyan, White, Black")
+    print("\n".join(CLOCK_KEYS.help_lines()))
     print()
     print()
     print("STOP WATCH Commands:")
-    print(" q  Q    Quit")
-    print(" g       Start or pause stop watch")
-    print(" h       Reset stop watch to 00:00:00")
-    print(" r,t,y,u,i,o,p,[")
-    print("         Select color: Red, Green, Blue, Yellow, Magenta, Cyan, White")
+    print("\n".join(STOP_WATCH_KEYS.help_lines()))
+    print()
+    print()
+    print("TIMER Commands:")
+    print("\n".join(TIMER_KEYS.help_lines()))
+    print()
+    print()
+    print("DASHBOARD Commands:")
+    print("\n".join(DASHBOARD_KEYS.help_lines()))
 
 
 def color_type(value: str) -> str:
@@ -514,8 +2516,33 @@ def color_type(value: str) -> str:
         raise argparse.ArgumentTypeError(f"{value} is an invalid color name")
 
 
+def timer_type(value: str) -> Tuple[str, int]:
+    """
+    Used with argparse to read a timer as [NAME=]DURATION, the duration in
+    seconds, as 1h20m30s or as H:MM:SS or M:SS.  Returns (name, seconds).
+    """
+    name, _, duration = value.rpartition("=")
+    seconds = None
+    match = re.fullmatch(r"(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s)?", duration)
+    if duration.isdigit():
+        seconds = int(duration)
+    elif match and duration:
+        hours, minutes, secs = (int(part or 0) for part in match.groups())
+        seconds = hours * 3600 + minutes * 60 + secs
+    elif re.fullmatch(r"\d+(:\d\d){1,2}", duration):
+        seconds = 0
+        for part in duration.split(":"):
+            seconds = seconds * 60 + int(part)
+    if seconds is None or not 0 < seconds < 100 * 3600:
+        raise argparse.ArgumentTypeError(f"{value} is an invalid timer, "
+                                         "use NAME=1h20m or 90s under 100 hours")
+    return name, seconds
+
+
 def argument_parser(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
-    parser = argparse.ArgumentParser()
+    # the options are listed below, a short usage keeps --help on one screen
+    parser = argparse.ArgumentParser(
+        usage="%(prog)s [options] [{stop_watch,timer,dashboard,serve,attach} ...]")
     parser.add_argument("-c", "--color", type=color_type, default="white",
                         help="digit color")
     parser.add_argument("-s", "--no_seconds", action="store_false",
@@ -531,6 +2558,7 @@ def argument_parser(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     parser.add_argument("--mode", type=int, choices=[0, 1], default=0,
                         help="Mode: 0-normal, 1-cycle whole")
     parser.add_argument("--cycle_timing", type=int, choices=[1, 2, 3], default=2,
+                        metavar="N",
                         help="Cycle timing (1 every sec, 2 every min, 3 every hour)")
     parser.add_argument("--show_date", action="store_true",
                         help="Show date")
@@ -538,20 +2566,56 @@ def argument_parser(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
                         help="Back ground color")
     parser.add_argument("--list_commands", action="store_true",
                         help="List commands available during run time.")
+    parser.add_argument("--ansi", action="store_true",
+                        help="Draw without curses, clock and stop watch")
+    parser.add_argument("--scale", action="store_true",
+                        help="Digits as large as the terminal allows")
+    parser.add_argument("--glyphs", choices=["digits", "half", "braille"],
+                        default="digits", metavar="STYLE",
+                        help="digits, half (blocks) or braille")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="FILE",
+                        help="Print timings on exit, JSON lines to FILE")
     parser.add_argument("--test_mode", action="store_true", help=argparse.SUPPRESS)
     parser.add_argument("--test_time", type=str, default="00:00:00",
                         help=argparse.SUPPRESS)
     parser.add_argument("--test_date", type=str, default="1970-1-2",
                         help=argparse.SUPPRESS)
+    parser.add_argument("--test_speed", type=float, default=1.0, help=argparse.SUPPRESS)
 
-    sub_parser = parser.add_subparsers(dest="command")
+    sub_parser = parser.add_subparsers(dest="command", prog=parser.prog)
     stop_watch_parser = sub_parser.add_parser("stop_watch")
     stop_watch_parser.add_argument("--auto_start", action="store_true",
                                    help="Auto start stop watch")
     stop_watch_parser.add_argument("-c", "--color", type=color_type, default="white",
                                    help="digit color")
+    stop_watch_parser.add_argument("--precision", type=int, choices=[0, 1, 2],
+                                   default=0,
+                                   help="Show tenths (1) or hundredths (2) of a second")
+    stop_watch_parser.add_argument("--laps", metavar="FILE", default=None,
+                                   help="Append laps to FILE, as JSON lines if it "
+                                        "ends in .jsonl, otherwise as CSV")
     stop_watch_parser.add_argument("--list_commands", action="store_true",
                                    help="List commands available during run time.")
+    timer_parser = sub_parser.add_parser("timer")
+    timer_parser.add_argument("timers", nargs="+", type=timer_type, metavar="timer",
+                              help="[NAME=]DURATION, like tea=3m or 1h20m")
+    timer_parser.add_argument("--auto_start", action="store_true",
+                              help="Start all timers")
+    timer_parser.add_argument("-c", "--color", type=color_type, default="white",
+                              help="digit color")
+    dashboard_parser = sub_parser.add_parser("dashboard")
+    dashboard_parser.add_argument("zones", nargs="+", metavar="zone",
+                                  help="IANA time zone, like Europe/London")
+    dashboard_parser.add_argument("-c", "--color", type=color_type, default="white",
+                                  help="digit color")
+    dashboard_parser.add_argument("-m", "--military_time", action="store_true",
+                                  help="Military time (24 hour clock)")
+    serve_parser = sub_parser.add_parser("serve")
+    serve_parser.add_argument("--socket", type=str, default=None,
+                              help="Unix socket path to listen on")
+    attach_parser = sub_parser.add_parser("attach")
+    attach_parser.add_argument("--socket", type=str, default=None,
+                               help="Unix socket path of the server")
     return parser.parse_args(argv)
 
 
@@ -560,21 +2624,43 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
     if args.list_commands:
         display_running_commands()
         return 0
-    elif args.command == "stop_watch":
-        try:
-            curses.wrapper(main_stopwatch, args)
-        except CTClockError as e:
-            print(e)
-            return 1
-        return 0
     try:
-        curses.wrapper(main_clock, args)
+        profiler = start_profiler(args)
     except CTClockError as e:
         print(e)
         return 1
+    try:
+        return run_command(args, profiler)
+    finally:
+        if profiler is not None:
+            profiler.close()
+
 
+def without_screen(func: Callable, args: argparse.Namespace,
+                   profiler: Optional[Profiler]) -> None:
+    # serve and attach write to their sockets and terminal themselves,
+    # start_profiler gives them no profiler
+    func(args)
+
+
+def run_command(args: argparse.Namespace, profiler: Optional[Profiler]) -> int:
+    wrapper = ansi_wrapper if args.ansi else curses_wrapper
+    main_func, wrapper = {
+        None: (main_clock, wrapper),
+        "stop_watch": (main_stopwatch, wrapper),
+        "timer": (main_timer, wrapper),
+        "dashboard": (main_dashboard, wrapper),
+        "serve": (main_server, without_screen),
+        "attach": (main_attach, without_screen),
+    }[args.command]
+    try:
+        wrapper(main_func, args, profiler)
+    except CTClockError as e:
+        print(e)
+        return 1
     except KeyboardInterrupt:
-        return 0
+        pass
+    return 0
 
 
 if __name__ == "__main__":
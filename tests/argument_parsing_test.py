@@ -81,6 +81,43 @@ def test_argument_parser_test_mode(test_value, expected):
     assert result.test_mode == expected
 
 
+@pytest.mark.parametrize("test_value, expected", [
+    ([], False), (["--ansi"], True), (["--ansi", "stop_watch"], True),
+])
+def test_argument_parser_ansi(test_value, expected):
+    result = ct_clock.argument_parser(test_value)
+    assert result.ansi == expected
+
+
+@pytest.mark.parametrize("test_value, expected", [
+    ([], False), (["--scale"], True), (["--scale", "dashboard", "UTC"], True),
+])
+def test_argument_parser_scale(test_value, expected):
+    result = ct_clock.argument_parser(test_value)
+    assert result.scale == expected
+
+
+@pytest.mark.parametrize("test_value, expected", [
+    ([], "digits"), (["--glyphs", "half"], "half"), (["--glyphs", "braille"], "braille"),
+])
+def test_argument_parser_glyphs(test_value, expected):
+    result = ct_clock.argument_parser(test_value)
+    assert result.glyphs == expected
+
+
+@pytest.mark.parametrize("test_value, expected", [
+    ([], None), (["--profile"], ""), (["--profile", "frames.jsonl"], "frames.jsonl"),
+])
+def test_argument_parser_profile(test_value, expected):
+    result = ct_clock.argument_parser(test_value)
+    assert result.profile == expected
+
+
+def test_argument_parser_glyphs_invalid():
+    with pytest.raises(SystemExit):
+        ct_clock.argument_parser(["--glyphs", "dots"])
+
+
 @pytest.mark.parametrize("test_value, expected", [
     ([], "00:00:00"), (["--test_time", "00:00:00"], "00:00:00"),
 ])
@@ -89,6 +126,14 @@ def test_argument_parser_test_time(test_value, expected):
     assert result.test_time == expected
 
 
+@pytest.mark.parametrize("test_value, expected", [
+    ([], 1.0), (["--test_speed", "60"], 60.0),
+])
+def test_argument_parser_test_speed(test_value, expected):
+    result = ct_clock.argument_parser(test_value)
+    assert result.test_speed == expected
+
+
 @pytest.mark.parametrize("test_value, expected", [
     ([], False), (["--list_commands"], True)
 ])
@@ -143,6 +188,15 @@ def test_argument_parser_sub_parser_stopwatch_color(test_value, expected):
     assert result.color == expected
 
 
+@pytest.mark.parametrize("test_value, expected", [
+    (["stop_watch"], 0), (["stop_watch", "--precision", "1"], 1),
+    (["stop_watch", "--precision", "2"], 2),
+])
+def test_argument_parser_sub_parser_stopwatch_precision(test_value, expected):
+    result = ct_clock.argument_parser(test_value)
+    assert result.precision == expected
+
+
 @pytest.mark.parametrize("test_value, expected", [
     (["stop_watch", "--list_commands"], True),
     (["stop_watch"], False)
@@ -152,6 +206,56 @@ def test_argument_parser_sub_parser_list_commands(test_value, expected):
     assert result.list_commands == expected
 
 
+@pytest.mark.parametrize("test_value, expected", [
+    (["dashboard", "UTC"], ["UTC"]),
+    (["dashboard", "Europe/London", "Asia/Tokyo"], ["Europe/London", "Asia/Tokyo"]),
+])
+def test_argument_parser_sub_parser_dashboard_zones(test_value, expected):
+    result = ct_clock.argument_parser(test_value)
+    assert result.command == "dashboard"
+    assert result.zones == expected
+
+
+def test_argument_parser_sub_parser_dashboard_needs_zone():
+    with pytest.raises(SystemExit):
+        ct_clock.argument_parser(["dashboard"])
+
+
+@pytest.mark.parametrize("test_value, expected", [
+    (["stop_watch"], None), (["stop_watch", "--laps", "laps.csv"], "laps.csv"),
+])
+def test_argument_parser_sub_parser_stopwatch_laps(test_value, expected):
+    result = ct_clock.argument_parser(test_value)
+    assert result.laps == expected
+
+
+def test_argument_parser_sub_parser_timer():
+    result = ct_clock.argument_parser(["timer", "--auto_start", "tea=3m", "1:30"])
+    assert result.command == "timer"
+    assert result.timers == [("tea", 180), ("", 90)]
+    assert result.auto_start
+
+
+@pytest.mark.parametrize("test_value", [[], ["5 minutes"]])
+def test_argument_parser_sub_parser_timer_invalid(test_value):
+    with pytest.raises(SystemExit):
+        ct_clock.argument_parser(["timer"] + test_value)
+
+
+@pytest.mark.parametrize("test_value, expected", [
+    ("90", ("", 90)), ("tea=3m", ("tea", 180)), ("1h20m30s", ("", 4830)),
+    ("1:02:03", ("", 3723)), ("oven=45s", ("oven", 45)),
+])
+def test_timer_type_valid_timer(test_value, expected):
+    assert ct_clock.timer_type(test_value) == expected
+
+
+@pytest.mark.parametrize("test_value", ["0", "tea", "1h20", "100h", "1:3", "tea="])
+def test_timer_type_invalid_timer(test_value):
+    with pytest.raises(ct_clock.argparse.ArgumentTypeError):
+        ct_clock.timer_type(test_value)
+
+
 @pytest.mark.parametrize("test_value, expected", [
     ("blue", "blue"), ("Yellow", "yellow"), ("GREEN", "green")
 ])
@@ -1,5 +1,10 @@
-import types
+import os
+import sys
+import json
+import signal
+import socket
 import contextlib
+import subprocess
 
 import pytest
 from time import sleep
@@ -10,15 +15,6 @@ from hecate import Runner
 import ct_clock
 
 
-@contextlib.contextmanager
-def my_time_context_manager(*args, **kwargs):
-    r = ct_clock.MyTime(*args, **kwargs)
-    try:
-        yield r
-    finally:
-        r.reset_time()
-
-
 def ct_clock_run(*args):
     options = [a for a in args]
     return ["python3", "ct_clock.py"] + options
@@ -55,131 +51,1122 @@ def test_get_segments(test_number, test_size, expected):
     assert result == expected
 
 
-def test_my_time_class_no_test():
-    with my_time_context_manager(False) as test_class:
-        assert test_class.test_mode is False
-        assert test_class.test_time == ""
-        assert test_class.tick is True
-        assert test_class.time is None
+class FakeScreen:
+    def __init__(self, size=(24, 80)):
+        self.size = size
+        self.calls = []
 
+    def getmaxyx(self):
+        return self.size
 
-def test_my_time_class_test_mode_tick():
-    with my_time_context_manager(True, "02:02:02") as test_class:
-        assert test_class.test_mode is True
-        assert test_class.test_time == "02:02:02"
-        assert test_class.tick is True
-        assert isinstance(test_class.time, types.GeneratorType)
+    def addstr(self, y, x, text, attr=0):
+        self.calls.append((y, x, text, attr))
 
+    def clear(self):
+        self.calls.clear()
 
-def test_my_time_class_test_mode_no_tick():
-    with my_time_context_manager(True, "02:02:02", False) as test_class:
-        assert test_class.test_mode is True
-        assert test_class.test_time == "02:02:02"
-        assert test_class.tick is False
-        assert isinstance(test_class.time, types.GeneratorType)
 
+@pytest.mark.parametrize("test_time, expected", [
+    ("2020-1-1 00:00:00.250", 755), ("2020-1-1 00:00:00.990", 15),
+    ("2020-1-1 00:00:00", 1005),
+])
+def test_tick_scheduler_timeout_ms(test_time, expected):
+    with time_machine.travel(test_time, tick=False):
+        assert ct_clock.TickScheduler().timeout_ms() == expected
 
-@pytest.mark.parametrize("test_time, test_format, expected", [
-    ("2:00:00", "%H%M%S", "020000"), ("14:00:00", "%H%M%S", "140000"),
-    ("2:00:00", "%I%M%S", "020000"), ("14:00:00", "%I%M%S", "020000"),
-    ("2:00:00", "%p", "AM"), ("14:00:00", "%p", "PM")
+
+@pytest.mark.parametrize("test_number, test_size, expected", [
+    ("1", "small", ((0, 2), (1, 2), (2, 2), (3, 2), (4, 2))),
+    (":", "medium", ((2, 5), (4, 5))),
 ])
-def test_my_time_get_time_no_test(test_time, test_format, expected):
-    with time_machine.travel(test_time):
-        t = ct_clock.MyTime(False)
-        result = t.get_time(test_format)
-        assert result == expected
+def test_glyphs(test_number, test_size, expected):
+    assert ct_clock.GLYPHS[(test_size, test_number)] == expected
 
 
-def test_my_time_get_time_test_mode_tick_on():
-    with my_time_context_manager(True, "02:00:00", True) as t:
-        assert t.get_time("%I%M%S") == "020000"
-        sleep(1)
-        assert t.get_time("%I%M%S") == "020001"
-        sleep(1)
-        assert t.get_time("%I%M%S") == "020002"
+@pytest.mark.parametrize("test_size", ["small", "medium", "large"])
+def test_glyphs_no_duplicate_cells(test_size):
+    for char in "0123456789:":
+        glyph = ct_clock.GLYPHS[(test_size, char)]
+        assert len(glyph) == len(set(glyph))
+        assert list(glyph) == sorted(glyph)
+        assert set(glyph) == set(ct_clock.get_segments(char, test_size))
 
 
-def test_my_time_get_time_test_mode_military_time_tick_on():
-    with my_time_context_manager(True, "16:00:00", True) as t:
-        assert t.get_time("%H%M%S") == "160000"
-        sleep(1)
-        assert t.get_time("%H%M%S") == "160001"
-        sleep(1)
-        assert t.get_time("%H%M%S") == "160002"
+@pytest.mark.parametrize("test_cells, expected", [
+    (((0, 0), (0, 1), (0, 2), (1, 0), (1, 2)), ((0, 0, 3), (1, 0, 1), (1, 2, 1))),
+    (((5, 12), (12, 12)), ((5, 12, 1), (12, 12, 1))),
+    ((), ()),
+])
+def test_compile_spans(test_cells, expected):
+    assert ct_clock.compile_spans(test_cells) == expected
 
 
-def test_my_time_get_time_test_mode_switch_military_time_tick_on():
-    with my_time_context_manager(True, "16:00:00", True) as t:
-        assert t.get_time("%H%M%S") == "160000"
-        sleep(1)
-        assert t.get_time("%I%M%S") == "040001"
-        sleep(1)
-        assert t.get_time("%H%M%S") == "160002"
-        sleep(1)
-        assert t.get_time("%I%M%S") == "040003"
+def test_glyph_spans_large_draw_calls():
+    spans = ct_clock.GLYPH_SPANS[("large", "8")]
+    cells = ct_clock.GLYPHS[("large", "8")]
+    assert sum(length for _, _, length in spans) == len(cells)
+    assert len(spans) == 30
 
 
-def test_my_time_get_time_test_mode_tick_off():
-    with my_time_context_manager(True, "02:00:00", False) as t:
-        assert t.get_time("%I%M%S") == "020000"
-        sleep(1)
-        assert t.get_time("%I%M%S") == "020000"
-        sleep(1)
-        assert t.get_time("%I%M%S") == "020000"
+@pytest.mark.parametrize("test_scaled, test_size", [
+    ((5, 3, 1), "small"), ((7, 4, 1), "medium"), ((18, 10, 2), "large"),
+])
+def test_scaled_glyphs_match_fixed_sizes(test_scaled, test_size):
+    assert ct_clock.scaled_size(test_scaled[0]) == test_scaled
+    ct_clock.add_scaled_glyphs(test_scaled)
+    for char in "0123456789":
+        assert ct_clock.GLYPHS[(test_scaled, char)] == ct_clock.GLYPHS[(test_size, char)]
+    assert ct_clock.get_offset(test_scaled) == ct_clock.get_offset(test_size)
+
+
+def test_scaled_glyphs_generated_once():
+    size = ct_clock.scaled_size(40)
+    ct_clock.add_scaled_glyphs(size)
+    spans = ct_clock.GLYPH_SPANS[(size, "8")]
+    ct_clock.add_scaled_glyphs(size)
+    assert ct_clock.GLYPH_SPANS[(size, "8")] is spans
+    colon = ct_clock.GLYPHS[(size, ":")]
+    assert len(colon) == 2 * size[2] ** 2  # two square dots, a stroke wide
+
+
+@pytest.mark.parametrize("test_pixels, test_style, expected", [
+    ({(0, 0), (1, 0), (0, 1), (3, 1)}, "half", ((0, 0, "\u2588\u2580"), (1, 1, "\u2584"))),
+    ({(0, 0), (3, 1), (4, 2)}, "braille", ((0, 0, "\u2881"), (1, 1, "\u2801"))),
+    (set(), "half", ()),
+])
+def test_rasterise(test_pixels, test_style, expected):
+    assert ct_clock.rasterise(test_pixels, test_style) == expected
+
+
+@pytest.mark.parametrize("test_size", ["small", "medium", "large", (30, 17, 3)])
+@pytest.mark.parametrize("test_style", ["half", "braille"])
+def test_raster_glyphs_keep_the_footprint(test_size, test_style):
+    ct_clock.add_raster_glyphs(test_size, test_style)
+    height, width, _ = ct_clock.SCALED_SIZES.get(test_size, test_size)
+    spans = ct_clock.RASTER_SPANS[(test_size, "8", test_style)]
+    cells = {(row, col + i) for row, col, text in spans for i in range(len(text))}
+    assert cells == {(row, col) for row in range(height) for col in range(width)
+                     if (row, col) in cells}
+    assert {row for row, _ in cells} == set(range(height))
+    assert {col for _, col in cells} == set(range(width))
+    ct_clock.add_raster_glyphs(test_size, test_style)
+    assert ct_clock.RASTER_SPANS[(test_size, "8", test_style)] is spans
+
+
+SECOND = 1000000000
+
+
+class FakeClock:
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_stop_watch_start_pause_reset():
+    clock = FakeClock(100 * SECOND)
+    stop_watch = ct_clock.StopWatch(clock)
+    assert stop_watch.get_time() == "000000"
+    clock.now += 5 * SECOND
+    assert stop_watch.get_time() == "000000"
+    stop_watch.start()
+    clock.now += 61 * SECOND + SECOND // 2
+    assert stop_watch.running is True
+    assert stop_watch.get_time() == "000101"
+    stop_watch.pause()
+    clock.now += 30 * SECOND
+    assert stop_watch.running is False
+    assert stop_watch.get_elapsed() == 61.5
+    stop_watch.start()
+    clock.now += 3600 * SECOND
+    assert stop_watch.get_time() == "010101"
+    stop_watch.reset()
+    assert stop_watch.running is False
+    assert stop_watch.get_time() == "000000"
+
+
+@pytest.mark.parametrize("precision, expected", [
+    (0, ("000102", "")), (1, ("000102", "5")), (2, ("000102", "53")),
+])
+def test_stop_watch_get_time_fraction(precision, expected):
+    clock = FakeClock(0)
+    stop_watch = ct_clock.StopWatch(clock)
+    stop_watch.start()
+    clock.now = 62 * SECOND + 539000000
+    assert stop_watch.get_time_fraction(precision) == expected
+
+
+def test_lap_store_csv(tmp_path):
+    path = tmp_path / "laps.csv"
+    laps = ct_clock.open_laps(str(path))
+    for split in (5 * SECOND, 12 * SECOND + 340000000, 20 * SECOND):
+        laps.add(split)
+    assert laps.lap_ns(1) == 7 * SECOND + 340000000
+    assert laps.latest_lines(2) == ["    3  00:00:20.00  +00:00:07.66",
+                                    "    2  00:00:12.34  +00:00:07.34"]
+    assert laps.splits.itemsize == 8  # a lap is one 8 byte integer
+    laps.close()
+    assert path.read_text().splitlines() == [
+        "lap,split_ns,lap_ns", "1,5000000000,5000000000",
+        "2,12340000000,7340000000", "3,20000000000,7660000000"]
+
+
+def test_lap_store_json_lines_append(tmp_path):
+    path = tmp_path / "laps.jsonl"
+    for _ in range(2):
+        laps = ct_clock.open_laps(str(path))
+        laps.add(SECOND)
+        laps.close()
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert rows == [{"lap": 1, "split_ns": SECOND, "lap_ns": SECOND}] * 2
+
+
+def test_open_laps_error(tmp_path):
+    with pytest.raises(ct_clock.CTClockError):
+        ct_clock.open_laps(str(tmp_path / "missing" / "laps.csv"))
+
+
+def test_main_stopwatch_laps(tmp_path):
+    path = tmp_path / "laps.csv"
+    screen = ct_clock.MemoryScreen(24, 80, keys=[108, 103, 108, 108, -1, 113])
+    args = ct_clock.argument_parser(["--test_mode", "stop_watch", "--laps", str(path)])
+    ct_clock.main_stopwatch(screen, args)
+    rows = [row.strip() for row in screen.text().splitlines()]
+    assert rows.index("1  00:00:00.00  +00:00:00.00") == \
+        rows.index("2  00:00:00.00  +00:00:00.00") + 1  # newest first
+    assert len(path.read_text().splitlines()) == 3  # no lap before the start
+
+
+def test_countdown_start_pause_reset():
+    clock = FakeClock(100 * SECOND)
+    countdown = ct_clock.Countdown("tea", 90 * SECOND, clock)
+    assert countdown.get_time() == "000130" and countdown.state == "Stopped"
+    countdown.start()
+    clock.now += 30 * SECOND + 1
+    assert countdown.get_time() == "000100"  # seconds left are rounded up
+    countdown.pause()
+    clock.now += 500 * SECOND
+    assert countdown.get_left_ns() == 60 * SECOND - 1
+    assert countdown.state == "Paused"
+    countdown.start()
+    assert countdown.deadline == clock.now + 60 * SECOND - 1
+    countdown.reset()
+    assert countdown.get_time() == "000130" and not countdown.running
+
+
+def test_timer_queue_earliest_first_skips_stale():
+    clock = FakeClock(0)
+    countdowns = [ct_clock.Countdown(str(i), (5 - i) * SECOND, clock) for i in range(5)]
+    queue = ct_clock.TimerQueue(countdowns)
+    for index, countdown in enumerate(countdowns):
+        countdown.start()
+        queue.push(index)
+    countdowns[4].pause()  # its entry is stale now
+    countdowns[3].pause()
+    countdowns[3].start()  # pushed again with the same deadline
+    queue.push(3)
+    assert queue.next_deadline() == 2 * SECOND
+    assert queue.pop_expired(2 * SECOND) == [3]
+    assert queue.pop_expired(4 * SECOND) == [2, 1]
+    assert [c.state for c in countdowns] == ["Running", "Done", "Done", "Done", "Paused"]
+    assert queue.next_deadline() == 5 * SECOND
+
+
+def test_main_timer_sleeps_until_events(no_curses_colors):
+    delays = []
+
+    class SimulatedClock(FakeClock):
+        rate = 0  # the runtime goes straight to each wake-up
+
+        def advance(self, seconds):
+            delays.append(seconds)
+            self.now += round(seconds * SECOND)
+
+    clock = SimulatedClock(0)
+    # a wait for each wake-up, q once the last timer is done
+    screen = ct_clock.MemoryScreen(26, 100, keys=[-1] * 4 + [113])
+    frames = capture_frames(screen)
+    args = ct_clock.argument_parser(["--test_mode", "timer", "--auto_start",
+                                     "tea=2s", "egg=4s", "3s"])
+    mode = ct_clock.TimerMode(screen, args, clock=clock)
+    ct_clock.Runtime(screen).run(mode)
+    # one wake per second shown, the last one at the last expiry
+    assert delays == [1, 1, 1, 1]
+    assert mode.idle
+    assert screen.beeps == 3
+    assert "egg  Done" in frames[0]
+    assert "Timer 3               00:00:00  Done" in frames[0]
+
+
+def test_timer_keys_dispatch():
+    clock = FakeClock(0)
+    screen = ct_clock.MemoryScreen(26, 100)
+    args = ct_clock.argument_parser(["timer", "tea=2s", "egg=4s"])
+    mode = ct_clock.TimerMode(screen, args, clock=clock)
+    mode.update_screen = False
+    for ch in (110, 103, 121, 82):  # n, g, y, R
+        mode.key(ch)
+    assert mode.update_screen
+    assert mode.focus == 1 and mode.countdowns[1].running
+    assert (mode.digit_color, mode.bg_color) == ("blue", "red")
+    assert not mode.key(78) and mode.focus == 0  # N
+    assert mode.key(113)
+
+
+def test_timer_layout_on_ansi_screen():
+    written = []
+    screen = ct_clock.AnsiScreen(26, 100, written.append)
+    clock = FakeClock(0)
+    countdowns = [ct_clock.Countdown(name, 60 * SECOND, clock) for name in ("tea", "egg")]
+    layout = ct_clock.TimerLayout(screen, len(countdowns), ct_clock.ColorPairs(screen))
+    layout.draw(countdowns, [0, 1], 0, "white", "black", False, "digits")
+    screen.doupdate()
+    assert len(written) == 1  # both windows in one write
+    assert b"tea  Stopped" in written[0] and b"egg" in written[0]
+
+
+def test_main_timer_profiled(no_curses_colors):
+    screen = ct_clock.MemoryScreen(26, 100, keys=[113])
+    args = ct_clock.argument_parser(["timer", "tea=2s", "egg=4s"])
+    profiler = ct_clock.Profiler()
+    ct_clock.main_timer(screen, args, profiler)
+    assert profiler.timers["display"][0] == screen.updates == 1
+    assert profiler.counters["derwin"] == 2
+    assert profiler.counters["addstr"] > 0  # drawn into the subwindows
+
+
+@pytest.mark.parametrize("interval, elapsed, expected", [
+    (1.0, 2.75, 255), (0.1, 2.75, 55), (0.01, 2.753, 12),
+])
+def test_tick_scheduler_stop_watch_clock(interval, elapsed, expected):
+    clock = FakeClock(0)
+    stop_watch = ct_clock.StopWatch(clock)
+    scheduler = ct_clock.TickScheduler(interval, stop_watch.get_elapsed)
+    stop_watch.start()
+    clock.now = int(elapsed * SECOND)
+    assert scheduler.timeout_ms() == expected
 
 
-def test_my_time_get_time_test_mode_reset_time():
-    with pytest.raises(StopIteration):
-        with my_time_context_manager(True, "16:00:00", True) as t:
-            assert t.get_time("%I%M%S") == "040000"
-            sleep(1)
-            assert t.get_time("%I%M%S") == "040001"
-            sleep(1)
-            t.reset_time()
-            assert t.get_time("%I%M%S") == "013002"
+@pytest.mark.parametrize("size, width, glyph_row", [
+    ("large", 100, 15), ("medium", 60, 11),
+])
+def test_display_fraction_glyphs(size, width, glyph_row):
+    screen = ct_clock.MemoryScreen(26, width)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    headless_display(screen, renderer, "000102", size=size, fraction="53")
+    rows = screen.text().splitlines()
+    assert "5" in rows[glyph_row] and "3" in rows[glyph_row]
+    assert ".53" not in screen.text()
+
+
+def test_display_fraction_text_when_glyphs_do_not_fit():
+    screen = ct_clock.MemoryScreen(12, 40)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    headless_display(screen, renderer, "000102", size="small", fraction="53")
+    assert ".53" in screen.text()
+
+
+def test_time_machine_not_imported_on_startup():
+    code = "import sys, ct_clock; print('time_machine' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                         text=True, check=True).stdout
+    assert out.strip() == "False"
+
+
+@pytest.fixture
+def no_curses_colors(monkeypatch):
+    init_calls = []
+    monkeypatch.setattr(ct_clock.curses, "COLOR_PAIRS", 64, raising=False)
+    monkeypatch.setattr(ct_clock.curses, "color_pair", lambda n: n * 256)
+    monkeypatch.setattr(ct_clock.curses, "init_pair",
+                        lambda *args: init_calls.append(args))
+    return init_calls
+
+
+def test_color_pairs_cached(no_curses_colors):
+    colors = ct_clock.ColorPairs()
+    assert colors.get("red", "black") == 256
+    assert colors.get("white", "white") == 512
+    assert colors.get("red", "black") == 256
+    assert no_curses_colors == [
+        (1, ct_clock.curses.COLOR_RED, ct_clock.curses.COLOR_BLACK),
+        (2, ct_clock.curses.COLOR_WHITE, ct_clock.curses.COLOR_WHITE),
+    ]
+
+
+def test_color_pairs_reuse_when_full(no_curses_colors, monkeypatch):
+    monkeypatch.setattr(ct_clock.curses, "COLOR_PAIRS", 3)
+    colors = ct_clock.ColorPairs()
+    colors.get("red", "black")
+    colors.get("blue", "black")
+    assert colors.generation == 0
+    assert colors.get("green", "black") == 256
+    assert colors.generation == 1
+
+
+def test_frame_renderer_first_frame_fills_background(no_curses_colors):
+    screen = FakeScreen(size=(3, 4))
+    renderer = ct_clock.FrameRenderer()
+    renderer.draw(screen, ("black", 3, 4), [(0, 0, "1", 512)])
+    assert screen.calls == [(0, 0, "    ", 256), (1, 0, "    ", 256),
+                            (0, 0, "1", 512)]
+
+
+def test_frame_renderer_only_paints_changes(no_curses_colors):
+    screen = FakeScreen(size=(3, 4))
+    renderer = ct_clock.FrameRenderer()
+    background = ("black", 3, 4)
+    renderer.draw(screen, background, [(0, 0, "11", 512)])
+    screen.calls.clear()
+    renderer.draw(screen, background, [(0, 1, "1", 512), (1, 1, "1", 512)])
+    assert screen.calls == [(0, 0, " ", 256), (1, 1, "1", 512)]
+
+
+def test_frame_renderer_merges_changes_into_runs(no_curses_colors):
+    screen = FakeScreen(size=(3, 4))
+    renderer = ct_clock.FrameRenderer()
+    background = ("black", 3, 4)
+    renderer.draw(screen, background, [(0, 0, "1", 512)])
+    screen.calls.clear()
+    renderer.draw(screen, background, [(0, 0, "2222", 512), (1, 1, "ab", 768)])
+    assert screen.calls == [(0, 0, "2222", 512), (1, 1, "ab", 768)]
+
+
+def test_frame_renderer_repaints_on_background_change(no_curses_colors):
+    screen = FakeScreen(size=(3, 4))
+    renderer = ct_clock.FrameRenderer()
+    renderer.draw(screen, ("black", 3, 4), [(0, 0, "1", 512)])
+    renderer.draw(screen, ("red", 3, 4), [(0, 0, "1", 512)])
+    assert screen.calls == [(0, 0, "    ", 512), (1, 0, "    ", 512),
+                            (0, 0, "1", 512)]
+
+
+def test_frame_renderer_digit_color_change_keeps_background(no_curses_colors):
+    screen = FakeScreen(size=(3, 4))
+    renderer = ct_clock.FrameRenderer()
+    renderer.draw(screen, ("black", 3, 4), [(0, 0, "1", 512)])
+    screen.calls.clear()
+    renderer.draw(screen, ("black", 3, 4), [(0, 0, "1", 768)])
+    assert screen.calls == [(0, 0, "1", 768)]
+
+
+def headless_display(screen, renderer, time_string, **kwargs):
+    options = dict(size="medium", color="white", show_seconds=True, am_pm="",
+                   show_date=False, colon_on=True, test_mode=True,
+                   military_time=True, date="", bg_color="black",
+                   stop_watch=False, stop_watch_state="", fraction="", title="",
+                   glyphs="digits")
+    options.update(kwargs)
+    height, width = screen.getmaxyx()
+    ct_clock.display(screen, time_string, options["size"], width, height,
+                     options["color"], options["show_seconds"], options["am_pm"],
+                     options["show_date"], options["colon_on"],
+                     options["test_mode"], options["military_time"],
+                     options["date"], options["bg_color"], options["stop_watch"],
+                     options["stop_watch_state"], renderer, options["fraction"],
+                     title=options["title"], glyphs=options["glyphs"])
+
+
+def capture_frames(screen):
+    # the text on screen each time it is erased, the last frame at exit
+    frames = []
+    erase = screen.erase
+    screen.erase = lambda: frames.append(screen.text()) or erase()
+    return frames
+
+
+def test_memory_screen_display():
+    screen = ct_clock.MemoryScreen(16, 60)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    headless_display(screen, renderer, "123456", color="red", bg_color="blue")
+    text = screen.text()
+    for ch in "123456:":
+        assert ch in text
+    assert "test mode" in text
+    assert "bg=blue" in text
+    assert screen.colors_at(4, 15) == (ct_clock.curses.COLOR_RED,
+                                       ct_clock.curses.COLOR_RED)
+    assert screen.colors_at(15, 0) == (ct_clock.curses.COLOR_WHITE,
+                                       ct_clock.curses.COLOR_BLACK)
+    assert screen.colors_at(14, 0) == (ct_clock.curses.COLOR_BLUE,
+                                       ct_clock.curses.COLOR_BLUE)
+
+
+def test_memory_screen_display_next_frame():
+    screen = ct_clock.MemoryScreen(16, 60)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    headless_display(screen, renderer, "120000", test_mode=False)
+    screen.reset_counters()
+    headless_display(screen, renderer, "120001", test_mode=False)
+    assert screen.calls < 10
+    screen.reset_counters()
+    headless_display(screen, ct_clock.FrameRenderer(ct_clock.ColorPairs(screen)),
+                     "120001", test_mode=False)
+    assert screen.calls > 30
+
+
+def test_frame_layout_cached():
+    screen = ct_clock.MemoryScreen(16, 60)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    headless_display(screen, renderer, "120000")
+    layout = next(iter(renderer.layouts.values()))
+    headless_display(screen, renderer, "120001")
+    assert list(renderer.layouts.values()) == [layout]
+    headless_display(screen, renderer, "120002", colon_on=False)
+    headless_display(screen, renderer, "120003")
+    assert len(renderer.layouts) == 2
+    assert list(renderer.layouts.values())[-1] is layout
+
+
+def test_frame_layout_cache_evicted_on_size_change():
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(ct_clock.MemoryScreen()))
+    headless_display(ct_clock.MemoryScreen(16, 60), renderer, "120000")
+    headless_display(ct_clock.MemoryScreen(16, 60), renderer, "120000", am_pm="PM")
+    assert len(renderer.layouts) == 2
+    headless_display(ct_clock.MemoryScreen(20, 60), renderer, "120000")
+    assert len(renderer.layouts) == 1
+    assert renderer.layout_size == (60, 20)
+
+
+def test_frame_layout_cache_size(monkeypatch):
+    monkeypatch.setattr(ct_clock, "LAYOUT_CACHE_SIZE", 2)
+    screen = ct_clock.MemoryScreen(16, 60)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    for date in ("01/01/2020", "02/01/2020", "03/01/2020"):
+        headless_display(screen, renderer, "120000", show_date=True, date=date)
+    assert [key[9] for key in renderer.layouts] == ["02/01/2020", "03/01/2020"]
+
+
+def rebuilt_parts(renderer, before):
+    return [i for i, (old, new) in enumerate(zip(before, renderer.parts))
+            if old is not new]
+
+
+@pytest.mark.parametrize("test_previous, test_current, expected", [
+    ("120001", "120002", [5]),
+    ("120059", "120100", [3, 4, 5]),
+    ("120009", "120010", [4, 5]),
+    ("125959", "010000", [0, 1, 2, 3, 4, 5]),
+    ("120002", "120002", []),
+])
+def test_frame_renderer_rebuilds_changed_digits(test_previous, test_current,
+                                                expected):
+    screen = ct_clock.MemoryScreen(16, 60)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    headless_display(screen, renderer, test_previous, military_time=False,
+                     show_date=True, date="01/01/2020", am_pm="PM")
+    before = list(renderer.parts)
+    headless_display(screen, renderer, test_current, military_time=False,
+                     show_date=True, date="01/01/2020", am_pm="PM")
+    assert rebuilt_parts(renderer, before) == expected
+
+
+def test_frame_renderer_colon_and_date_parts():
+    screen = ct_clock.MemoryScreen(16, 60)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    headless_display(screen, renderer, "120001", show_date=True, date="01/01/2020")
+    before = list(renderer.parts)
+    headless_display(screen, renderer, "120001", show_date=True, date="01/01/2020",
+                     colon_on=False)
+    assert rebuilt_parts(renderer, before) == [7, 8]
+    assert ":" not in screen.text()
+    before = list(renderer.parts)
+    headless_display(screen, renderer, "120001", show_date=True, date="02/01/2020",
+                     colon_on=False)
+    assert rebuilt_parts(renderer, before) == [11]
+    assert "02/01/2020" in screen.text()
+
+
+def test_frame_renderer_later_parts_win(no_curses_colors):
+    screen = FakeScreen(size=(3, 4))
+    renderer = ct_clock.FrameRenderer()
+    background = ("black", 3, 4)
+    under = (ct_clock.runs_of, ((0, 0, "aaa", 512),))
+    renderer.draw_parts(screen, background, [under, (ct_clock.runs_of, ((0, 1, "b", 768),))])
+    screen.calls.clear()
+    renderer.draw_parts(screen, background, [under, (ct_clock.runs_of, ())])
+    assert screen.calls == [(0, 1, "a", 512)]
+
+
+def test_memory_screen_addstr_wraps():
+    screen = ct_clock.MemoryScreen(2, 4)
+    screen.addstr(0, 2, "abcd")
+    assert screen.text() == "  ab\ncd"
+    with pytest.raises(ct_clock.curses.error):
+        screen.addstr(1, 2, "xyz")
+    with pytest.raises(ct_clock.curses.error):
+        screen.addstr(2, 0, "x")
+    assert screen.calls == 3
+    assert screen.bytes == 8
+
+
+def test_memory_screen_derwin():
+    screen = ct_clock.MemoryScreen(4, 10)
+    window = screen.derwin(2, 5, 1, 5)
+    window.addstr(1, 0, "abc")
+    assert window.text() == "\nabc"
+    assert screen.text() == "\n\n     abc\n"
+    assert screen.calls == 1
+    window.erase()
+    assert screen.text() == "\n\n\n"
+    with pytest.raises(ct_clock.curses.error):
+        screen.derwin(2, 5, 3, 5)
+
+
+@pytest.mark.parametrize("test_size, expected", [
+    ((100, 26, 0), "large"), ((90, 20, 0), "large"), ((89, 20, 0), "medium"),
+    ((90, 20, 2), "medium"), ((90, 22, 2), "large"), ((46, 11, 2), "medium"),
+    ((46, 10, 2), "small"),
+    ((36, 8, 0), "small"), ((36, 9, 2), "small"),
+])
+def test_get_text_size(test_size, expected):
+    assert ct_clock.get_text_size(*test_size) == expected
 
 
-def test_my_time_test_date():
-    with my_time_context_manager(True, "1970-1-2 07:00:00") as t:
-        assert t.get_date("%d/%m/%Y") == "02/01/1970"
+@pytest.mark.parametrize("test_size", [(35, 20, 0), (36, 7, 0), (36, 8, 2)])
+def test_get_text_size_too_small(test_size):
+    with pytest.raises(ct_clock.CTClockError):
+        ct_clock.get_text_size(*test_size)
 
 
-def test_my_time_date_no_test():
-    with time_machine.travel("1980-8-21 11:00:00"):
-        t = ct_clock.MyTime(False)
-        assert t.get_date("%d/%m/%Y") == "21/08/1980"
+@pytest.mark.parametrize("test_size, expected", [
+    ((100, 26, 0), (20, 11, 2)), ((100, 26, 2), (20, 11, 2)),
+    ((400, 100, 0), (85, 47, 9)), ((46, 10, 0), (8, 4, 1)), ((36, 8, 0), None),
+])
+def test_get_scaled_size(test_size, expected):
+    assert ct_clock.get_scaled_size(*test_size) == expected
+
+
+def test_get_text_size_scale_falls_back_to_small():
+    assert ct_clock.get_text_size(36, 8, scale=True) == "small"
+    with pytest.raises(ct_clock.CTClockError):
+        ct_clock.get_text_size(35, 8, scale=True)
+
+
+def test_display_scaled_fills_wall_screen():
+    screen = ct_clock.MemoryScreen(100, 400)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    size = ct_clock.get_text_size(400, 100, scale=True)
+    ct_clock.display(screen, "123456", size, 400, 100, "white", True, "PM", True,
+                     True, True, False, "01/01/2020", "black", False, "", renderer)
+    rows = [row for row in screen.text().splitlines() if "6" in row]
+    assert len(rows) == size[0]
+    assert "PM" in screen.text()
+
+
+@pytest.mark.parametrize("test_style, test_char", [("half", "\u2588"), ("braille", "\u28ff")])
+def test_display_raster_glyphs(test_style, test_char):
+    screen = ct_clock.MemoryScreen(26, 100)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    headless_display(screen, renderer, "120000")
+    digits = screen.text()
+    headless_display(screen, renderer, "120000", glyphs=test_style)
+    text = screen.text()
+    assert test_char in text
+    assert not set("0123456") & set(text.replace("white", "").replace("bg=", ""))
+    # same place on screen as the digits
+    assert ([bool(row.strip()) for row in text.splitlines()[3:]]
+            == [bool(row.strip()) for row in digits.splitlines()[3:]])
+
+
+@pytest.mark.parametrize("test_zone, test_military, expected", [
+    ("UTC", True, ("030405", "")),
+    ("UTC", False, ("030405", "AM")),
+    ("Asia/Tokyo", False, ("120405", "PM")),
+    ("America/New_York", True, ("220405", "")),
+    ("America/New_York", False, ("100405", "PM")),
+])
+def test_zone_time(test_zone, test_military, expected):
+    zone_time = ct_clock.load_zones([test_zone])[0]
+    second = 86400 + 3 * 3600 + 4 * 60 + 5  # 1970-01-02 03:04:05 UTC
+    assert zone_time.name == test_zone
+    assert zone_time.get_time(second, test_military) == expected
+
+
+@pytest.mark.parametrize("test_zone", ["Mars/Olympus_Mons", "../etc/passwd", ""])
+def test_load_zones_unknown_zone(test_zone):
+    with pytest.raises(ct_clock.CTClockError):
+        ct_clock.load_zones(["UTC", test_zone])
+
+
+def test_main_dashboard_headless(no_curses_colors, monkeypatch):
+    monkeypatch.setattr(ct_clock.curses, "curs_set", lambda visibility: None)
+    screen = ct_clock.MemoryScreen(26, 200, keys=[113])
+    monkeypatch.setattr(ct_clock.curses, "doupdate", screen.doupdate)
+    frames = capture_frames(screen)
+    args = ct_clock.argument_parser(["--test_mode", "--test_time", "03:04:05",
+                                     "dashboard", "UTC", "Asia/Tokyo"])
+    ct_clock.main_dashboard(screen, args)
+    frame = frames[0]  # what was on screen when q was pressed
+    left = "\n".join(row[:100] for row in frame.splitlines())
+    right = "\n".join(row[100:] for row in frame.splitlines())
+    assert "UTC" in left and "Asia/Tokyo" in right
+    assert "3" in left and "3" not in right
+    assert "AM" in left and "PM" in right
+    assert screen.updates == 1  # both panes went out in one update
+
+
+def test_main_dashboard_profiled(no_curses_colors):
+    screen = ct_clock.MemoryScreen(26, 200, keys=[113])
+    args = ct_clock.argument_parser(["--test_mode", "dashboard", "UTC", "Asia/Tokyo"])
+    profiler = ct_clock.Profiler()
+    ct_clock.main_dashboard(screen, args, profiler)
+    assert profiler.timers["display"][0] == 2  # one per pane
+    assert profiler.counters["derwin"] == 2 and profiler.counters["doupdate"] == 1
+
+
+def test_main_stopwatch_resize_storm(monkeypatch):
+    resize = ct_clock.curses.KEY_RESIZE
+    # the storm, a wait and q
+    screen = ct_clock.MemoryScreen(26, 100, keys=[resize] * 200 + [-1, 113])
+    getch = screen.getch
+
+    def dragged_getch():
+        # the window shrinks with every resize while it is dragged
+        if screen.keys and screen.keys[0] == resize:
+            dragged = 203 - len(screen.keys)
+            screen.height, screen.width = 26 - dragged // 16, 100 - dragged // 4
+        return getch()
+
+    monkeypatch.setattr(screen, "getch", dragged_getch)
+    layouts = []
+    screen_layout = ct_clock.screen_layout
+    monkeypatch.setattr(ct_clock, "screen_layout",
+                        lambda *args, **kwargs: layouts.append(
+                            screen_layout(*args, **kwargs)) or layouts[-1])
+    args = ct_clock.argument_parser(["--test_mode", "stop_watch"])
+    ct_clock.main_stopwatch(screen, args)
+    assert layouts == [(26, 100, "large"), (14, 50, "medium")]
+    assert screen.updates == 2  # the first frame and one after the storm
+
+
+class CountingMode:
+    def __init__(self, interval, idle=False):
+        self.scheduler = ct_clock.TickScheduler(interval)
+        self.idle = idle
+        self.frames = 0
+        self.keys = []
+        self.closed = False
+
+    def draw(self):
+        self.frames += 1
+
+    def key(self, ch):
+        self.keys.append(ch)
+        return ch == 113
+
+    def resize(self):
+        raise ct_clock.CTClockError("Error screen / window is to small")
+
+    def close(self):
+        self.closed = True
+
+
+def test_runtime_ticks_wake_the_loop():
+    # every -1 waits for the next wake-up, here the 10 ms ticks
+    screen = ct_clock.MemoryScreen(keys=[-1, -1, -1, 113])
+    mode = CountingMode(0.01)
+    ct_clock.Runtime(screen).run(mode)
+    assert mode.frames == 4
+    assert mode.keys == [113] and mode.closed
+
+
+def test_runtime_one_frame_per_key_burst():
+    screen = ct_clock.MemoryScreen(keys=[114, 116, 121, 117, -1, 113])
+    mode = CountingMode(1, idle=True)
+    ct_clock.Runtime(screen).run(mode)
+    assert mode.frames == 2  # the first frame and one for the four keys
+
+
+def test_runtime_curses_resize_is_read_once(monkeypatch):
+    import asyncio
+
+    resize = ct_clock.curses.KEY_RESIZE
+
+    class CursesScreen:
+        # no input_fds, so the runtime treats it as a curses window
+        def __init__(self, keys):
+            self.keys = keys
+            self.reads = 0
+
+        def timeout(self, delay):
+            pass
+
+        def getch(self):
+            self.reads += 1
+            assert self.reads < 100, "the resizes never end"
+            return self.keys.pop(0) if self.keys else -1
+
+    screen = CursesScreen([])
+    # like ncurses, resizeterm queues a KEY_RESIZE for the next getch
+    monkeypatch.setattr(ct_clock.curses, "resizeterm",
+                        lambda lines, columns: screen.keys.append(resize))
+    monkeypatch.setattr(ct_clock.os, "get_terminal_size",
+                        lambda fd: os.terminal_size((160, 45)))
+    runtime = ct_clock.Runtime(screen)
+    runtime.mode = CountingMode(1, idle=True)
+    runtime.loop = asyncio.new_event_loop()
+    try:
+        runtime.wake = asyncio.Event()
+        runtime.sigwinch()
+        assert screen.keys == [resize]
+        runtime.read_keys()
+        assert screen.keys == [] and screen.reads == 2
+        assert runtime.settle is not None  # one relayout, once the burst is over
+        runtime.settle.cancel()
+    finally:
+        runtime.loop.close()
+
+
+def test_runtime_callback_errors_are_raised():
+    screen = ct_clock.MemoryScreen(keys=[ct_clock.curses.KEY_RESIZE, -1])
+    mode = CountingMode(1, idle=True)
+    with pytest.raises(ct_clock.CTClockError):
+        ct_clock.Runtime(screen).run(mode)
+    assert mode.closed
+
+
+def test_key_table_help_lines():
+    table = ct_clock.KeyTable([
+        ("q  Q", (113, 81), "Quit", None),
+        ("r,t,y,u,i,o,p,[", (114,), "Select color", None),
+    ])
+    assert table.help_lines() == [" q  Q    Quit", " r,t,y,u,i,o,p,[",
+                                  "         Select color"]
+
+
+@pytest.mark.parametrize("test_table", ["CLOCK_KEYS", "STOP_WATCH_KEYS"])
+def test_key_table_one_action_per_key(test_table):
+    rows = getattr(ct_clock, test_table).rows
+    codes = [ch for _, row_codes, _, _ in rows for ch in row_codes]
+    assert len(codes) == len(set(codes))
+
+
+def test_main_clock_one_frame_per_key_burst():
+    # a pasted burst: seconds off and on, 24 hour clock, a color and back
+    screen = ct_clock.MemoryScreen(26, 100, keys=[115, 115, 109, 114, 112, -1, 113])
+    frames = capture_frames(screen)
+    args = ct_clock.argument_parser(["--test_mode", "--test_time", "15:04:05"])
+    ct_clock.main_clock(screen, args)
+    assert screen.updates == 2  # the first frame and one for the five keys
+    assert "PM" not in frames[0] and "white" in frames[0]
+
+
+def test_profiler_timed_histogram():
+    times = iter([0.0, 1.0, 1.0001, 2.0, 2.003])
+    profiler = ct_clock.Profiler(clock=lambda: next(times))
+    timed = profiler.timed("work", lambda value: value * 2)
+    assert timed(21) == 42
+    assert timed(1) == 2
+    count, total, longest, buckets = profiler.timers["work"]
+    assert count == 2
+    assert total == pytest.approx(0.0031)
+    assert longest == pytest.approx(0.003)
+    assert buckets == {7: 1, 12: 1}  # 100 us and 3000 us
+
+
+def test_profiler_json_lines(tmp_path, capsys):
+    path = tmp_path / "profile.jsonl"
+    profiler = ct_clock.Profiler(str(path))
+    profiler.timed("display", lambda: None)()
+    profiler.count("addstr", 3)
+    profiler.close()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["display", "summary"]
+    assert lines[1]["counters"] == {"addstr": 3}
+    assert lines[1]["timers"]["display"]["count"] == 1
+    summary = capsys.readouterr().err
+    assert "display" in summary and "addstr 3" in summary
+
+
+def test_main_profile_file_not_writable(tmp_path, capsys):
+    path = tmp_path / "missing" / "profile.jsonl"
+    assert ct_clock.main(["--profile", str(path)]) == 1
+    assert capsys.readouterr().out.startswith(f"Can not write the profile to {path}")
+
+
+def test_main_stopwatch_profiled():
+    screen = ct_clock.MemoryScreen(26, 100, keys=[103, -1, 103, -1, 113])
+    args = ct_clock.argument_parser(["--test_mode", "stop_watch"])
+    profiler = ct_clock.Profiler()
+    ct_clock.main_stopwatch(screen, args, profiler)
+    assert profiler.timers["display"][0] == screen.updates == 3
+    assert profiler.timers["wait"][0] == 2
+    assert profiler.timers["loop"][0] == 1  # between the waits
+    assert profiler.counters["doupdate"] == 3
+    counters = profiler.counters
+    assert counters["addstr"] == screen.calls - counters["noutrefresh"] - counters["clear"]
+
+
+@pytest.mark.parametrize("test_argv, test_env, expected", [
+    ([], None, None), (["--profile"], None, ""), (["--profile", "out.jsonl"], None, "out.jsonl"),
+    ([], "1", ""), ([], "env.jsonl", "env.jsonl"), (["--profile", "out.jsonl", "serve"], None, None),
+    (["attach"], "env.jsonl", None),
+])
+def test_start_profiler(monkeypatch, test_argv, test_env, expected):
+    if test_env is None:
+        monkeypatch.delenv("CT_CLOCK_PROFILE", raising=False)
+    else:
+        monkeypatch.setenv("CT_CLOCK_PROFILE", test_env)
+    opened = []
+    monkeypatch.setattr(ct_clock, "open", lambda path, mode: opened.append(path)
+                        or open(os.devnull, mode), raising=False)
+    profiler = ct_clock.start_profiler(ct_clock.argument_parser(test_argv))
+    if expected is None:
+        assert profiler is None
+    else:
+        assert opened == ([expected] if expected else [])
+
+
+def test_ansi_screen():
+    written = []
+    screen = ct_clock.AnsiScreen(3, 10, written.append)
+    attr = screen.color_pair(1)
+    screen.init_pair(1, ct_clock.curses.COLOR_RED, ct_clock.curses.COLOR_BLUE)
+    screen.clear()
+    screen.addstr(0, 0, "ab", attr)
+    screen.addstr(2, 5, "c", attr)
+    assert written == []
+    screen.refresh()
+    screen.refresh()
+    assert written == [b"\x1b[0m\x1b[H\x1b[2J\x1b[31;44mab\x1b[3;6Hc"]
+    assert screen.bytes == len(written[0])
+
+
+def test_ansi_screen_derwin():
+    written = []
+    screen = ct_clock.AnsiScreen(3, 10, written.append)
+    window = screen.derwin(2, 4, 1, 6)
+    assert window.getmaxyx() == (2, 4)
+    window.addstr(0, 1, "x")
+    window.clear()
+    screen.refresh()
+    # the bottom right cell of the terminal is not written
+    assert written == [b"\x1b[37;40m\x1b[2;8Hx\x1b[7G    \x1b[3;7H   "]
+    with pytest.raises(ct_clock.curses.error):
+        screen.derwin(2, 4, 2, 6)
+
+
+def test_ansi_screen_relative_moves():
+    written = []
+    screen = ct_clock.AnsiScreen(5, 20, written.append)
+    screen.addstr(1, 2, "ab")
+    screen.addstr(1, 10, "c")
+    screen.addstr(3, 11, "d")
+    screen.addstr(3, 12, "e")
+    screen.refresh()
+    # same row moves the column, same column moves the row, adjacent text moves nothing
+    assert written == [b"\x1b[37;40m\x1b[2;3Hab\x1b[11Gc\x1b[4dde"]
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"\x1b[Aq", ([ct_clock.curses.KEY_UP, 113], b"")),
+    (b"\x1bOP\x1bOA", ([ct_clock.curses.KEY_F1, ct_clock.curses.KEY_UP], b"")),
+    (b"\x1b[15~g\x1b[1;5B", ([103, ct_clock.curses.KEY_DOWN], b"")),  # F5 is dropped
+    (b"h\x1b[1;", ([104], b"\x1b[1;")),
+    (b"\x1b", ([27], b"")),
+])
+def test_parse_keys(data, expected):
+    assert ct_clock.parse_keys(data) == expected
 
 
-def test_my_time_pause():
-    with my_time_context_manager(True, "00:00:00", True) as t:
-        assert t.get_time("%H%M%S") == "000000"
-        sleep(2)
-        assert t.get_time("%H%M%S") == "000002"
-        t.pause()
-        sleep(1)
-        t.unpause()
-        t.get_time("%H%M%S")
-        assert t.get_time("%H%M%S") == "000002"
+def test_ansi_terminal_arrow_keys():
+    keys, typed = os.pipe()
+    wakeup, resized = os.pipe()
+    screen = ct_clock.AnsiTerminal(wakeup, keys)
+    screen.timeout(0)
+    try:
+        os.write(typed, b"\x1b[A\x1b[")
+        assert screen.getch() == ct_clock.curses.KEY_UP
+        assert screen.getch() == -1  # the rest of the sequence is not read yet
+        os.write(typed, b"Dq")
+        assert [screen.getch(), screen.getch()] == [ct_clock.curses.KEY_LEFT, 113]
+        assert screen.input_fds() == [keys, wakeup]
+        assert ct_clock.AnsiTerminal(wakeup, None).input_fds() == [wakeup]
+    finally:
+        for fd in (keys, typed, wakeup, resized):
+            os.close(fd)
+
+
+def test_ansi_screen_one_write_per_update():
+    written = []
+    screen = ct_clock.AnsiScreen(16, 60, written.append)
+    renderer = ct_clock.FrameRenderer(ct_clock.ColorPairs(screen))
+    headless_display(screen, renderer, "120000")
+    headless_display(screen, renderer, "120001", title="UTC")
+    assert written == []
+    screen.doupdate()
+    screen.doupdate()
+    assert len(written) == screen.writes == 1
+    assert screen.bytes == len(written[0])
+
+
+def render_group_frame(group, time_string):
+    args = ct_clock.argument_parser(["--test_mode", "serve"])
+    group.draw(args, time_string, "PM", "", True)
+
+
+def test_render_group_viewers_get_the_same_bytes():
+    group = ct_clock.RenderGroup(16, 60)
+    viewers = [socket.socketpair() for _ in range(2)]
+    for server_side, _ in viewers:
+        group.add(server_side)
+    render_group_frame(group, "120000")
+    first = [viewer.recv(65536) for _, viewer in viewers]
+    assert first[0] == first[1]
+    assert first[0].startswith(b"\x1b[0m\x1b[H\x1b[2J")
+    render_group_frame(group, "120001")
+    second = [viewer.recv(65536) for _, viewer in viewers]
+    assert second[0] == second[1]
+    assert len(second[0]) < len(first[0]) / 4
+    for pair in viewers:
+        for sock in pair:
+            sock.close()
+
+
+def test_render_group_drops_closed_viewer():
+    group = ct_clock.RenderGroup(16, 60)
+    server_side, viewer = socket.socketpair()
+    group.add(server_side)
+    viewer.close()
+    render_group_frame(group, "120000")
+    assert group.dropped == {server_side}
+    server_side.close()
+
+
+def test_render_group_too_small():
+    with pytest.raises(ct_clock.CTClockError):
+        ct_clock.RenderGroup(5, 20)
+
+
+def test_main_server_keeps_a_file_that_is_not_a_socket(tmp_path):
+    path = tmp_path / "ct_clock.sock"
+    path.write_text("notes")
+    args = ct_clock.argument_parser(["serve", "--socket", str(path)])
+    with pytest.raises(ct_clock.CTClockError, match="not a socket"):
+        ct_clock.main_server(args)
+    assert path.read_text() == "notes"
+
+
+def test_virtual_clock_rate_and_advance():
+    real = FakeClock(1000.0)
+    clock = ct_clock.VirtualClock(50.0, rate=60, real=real)
+    assert clock() == 50.0
+    real.now += 0.5
+    assert clock() == 80.0  # half a second is half a minute
+    clock.advance(20)
+    assert clock() == 100.0
+    assert ct_clock.real_seconds(clock, 60) == 1
+
+
+def test_get_clock_test_mode_is_local_test_time():
+    args = ct_clock.argument_parser(["--test_mode", "--test_time", "03:04:05",
+                                     "--test_date", "2021-12-15", "--test_speed", "10"])
+    clock = ct_clock.get_clock(args)
+    assert clock.rate == 10
+    assert ct_clock.MyTime(clock).get_time("%H%M%S") == "030405"
+    assert ct_clock.get_clock(ct_clock.argument_parser([])) is ct_clock.time.time
+
+
+@pytest.mark.parametrize("date, time_of_day, expected", [
+    ("2021-01-01", "10:00", 1609495200.0),
+    ("2021/01/01", "10:00:00", 1609495200.0),
+    ("2021.1.1", "10:00:00.5", 1609495200.5),
+    ("1970-1-2", "00:00:00", 86400.0),
+])
+def test_get_clock_test_date_and_time_formats(date, time_of_day, expected):
+    args = ct_clock.argument_parser(["--test_mode", "--test_time", time_of_day,
+                                     "--test_date", date])
+    assert ct_clock.get_clock(args, utc=True).start == expected
 
 
-def test_my_time_reset():
-    with my_time_context_manager(True, "00:00:00", True) as t:
-        assert t.get_time("%H%M%S") == "000000"
-        sleep(2)
-        assert t.get_time("%H%M%S") == "000002"
-        t.reset()
-        assert t.get_time("%H%M%S") == "000000"
+@pytest.mark.parametrize("option, value", [
+    ("--test_time", "noon"), ("--test_time", "25:00"), ("--test_date", "2021-02-30"),
+    ("--test_speed", "0"),
+])
+def test_get_clock_bad_test_options(option, value):
+    args = ct_clock.argument_parser(["--test_mode", option, value])
+    with pytest.raises(ct_clock.CTClockError):
+        ct_clock.get_clock(args)
+
+
+@pytest.mark.parametrize("test_timing, expected_changes", [(2, 1440), (3, 24)])
+def test_main_clock_simulated_day(test_timing, expected_changes):
+    args = ct_clock.argument_parser(["--test_mode", "--test_time", "23:59:00", "--mode",
+                                     "1", "--cycle_timing", str(test_timing)])
+    start = ct_clock.get_clock(args).start
+    clock = ct_clock.VirtualClock(start, rate=0)  # jumps from second to second
+    screen = ct_clock.MemoryScreen(26, 100)
+    mode = ct_clock.ClockMode(screen, args, clock=clock)
+    frames = []
+    mode.draw_frame = lambda screen, time_string, size, size_x, size_y, color, \
+        show_seconds, am_pm, *args, **kwargs: frames.append((time_string, am_pm, color))
+    ct_clock.Runtime(screen).run(mode, until=start + 24 * 3600)
+    assert len(frames) == 24 * 3600 + 1  # every second once, 23:59:00 twice
+    assert frames[0][:2] == frames[-1][:2] == ("115900", "PM")
+    assert frames[59][:2] == ("115959", "PM")
+    assert frames[60][:2] == ("120000", "AM")  # midnight
+    assert frames[60 + 12 * 3600][:2] == ("120000", "PM")
+    changes = sum(a[2] != b[2] for a, b in zip(frames, frames[1:]))
+    assert changes == expected_changes
+
+
+def test_my_time_follows_its_clock():
+    args = ct_clock.argument_parser(["--test_mode", "--test_time", "16:00:00"])
+    clock = ct_clock.VirtualClock(ct_clock.get_clock(args).start, rate=0)
+    t = ct_clock.MyTime(clock)
+    assert t.get_time("%H%M%S") == "160000"
+    clock.advance(1)
+    assert t.get_time("%I%M%S") == "040001"
+    assert t.get_time("%p") == "PM"
+    assert t.get_date("%d/%m/%Y") == "02/01/1970"
+    clock.advance(8 * 3600)
+    assert t.get_time("%H%M%S") == "000001"
+    assert t.get_date("%d/%m/%Y") == "03/01/1970"
 
 
-def test_my_time_get_time_paused():
-    with my_time_context_manager(True, "00:00:00", True) as t:
-        assert t.get_time("%H%M%S") == "000000"
-        sleep(2)
-        assert t.get_time("%H%M%S") == "000002"
-        t.pause()
-        sleep(1)
-        assert t.get_time("%H%M%S") == "000002"
+@pytest.mark.parametrize("test_time, test_format, expected", [
+    ("2:00:00", "%H%M%S", "020000"), ("14:00:00", "%H%M%S", "140000"),
+    ("2:00:00", "%I%M%S", "020000"), ("14:00:00", "%I%M%S", "020000"),
+    ("2:00:00", "%p", "AM"), ("14:00:00", "%p", "PM")
+])
+def test_my_time_get_time_no_test(test_time, test_format, expected):
+    with time_machine.travel(test_time):
+        t = ct_clock.MyTime()
+        result = t.get_time(test_format)
+        assert result == expected
+
+
+@pytest.mark.parametrize("test_time, test_format, expected", [
+    ("00:30:00", "%I%M%S", "123000"), ("12:15:09", "%I%M%S", "121509"),
+    ("23:59:59", "%H%M%S", "235959"), ("00:00:00", "%p", "AM"),
+    ("12:00:00", "%p", "PM"), ("11:59:59", "%p", "AM"),
+])
+def test_my_time_get_time_format(test_time, test_format, expected):
+    with time_machine.travel(test_time):
+        assert ct_clock.MyTime().get_time(test_format) == expected
+
+
+def test_my_time_formats_once_per_second(monkeypatch):
+    with time_machine.travel("2021-12-15 10:00:00", tick=False) as traveller:
+        t = ct_clock.MyTime()
+        first = t.get_time("%H%M%S")
+        date = t.get_date("%d/%m/%Y")
+        monkeypatch.setattr(t, "_format_time", None)
+        monkeypatch.setattr(ct_clock.time, "strftime", None)
+        assert t.get_time("%H%M%S") is first
+        assert t.get_date("%d/%m/%Y") is date
+        monkeypatch.undo()
+        traveller.shift(1)
+        assert t.get_time("%H%M%S") == "100001"
+        assert t.get_date("%d/%m/%Y") == "15/12/2021"
+
+
+def test_my_time_date_no_test():
+    with time_machine.travel("1980-8-21 11:00:00"):
+        t = ct_clock.MyTime()
+        assert t.get_date("%d/%m/%Y") == "21/08/1980"
 
 
 @pytest.mark.parametrize("test_key", ["Q", "q"])
@@ -987,6 +1974,18 @@ def test_ct_clock_stopwatch_auto_start():
         h.await_text("Stop Watch  Running")
 
 
+def test_ct_clock_stopwatch_laps():
+    with Runner(*ct_clock_run("--test_mode", "stop_watch", "--auto_start")) as h:
+        h.default_timeout = 3
+        h.await_text("Stop Watch  Running")
+        h.press("l")
+        h.await_text("1  00:00:0")
+        h.press("l")
+        h.await_text("2  00:00:0")
+        h.press("h")
+        h.await_text("Stop Watch  Stopped")
+        assert "1  00:00:0" not in h.screenshot()
+
 def test_ct_clock_stopwatch_default_color():
     with Runner(*ct_clock_run("--test_mode", "stop_watch")) as h:
         h.await_text("Stop Watch  Stopped")
@@ -1017,3 +2016,136 @@ def test_ct_clock_stopwatch_cli_color():
     with Runner(*ct_clock_run("--test_mode", "stop_watch", "-c", "yellow")) as h:
         h.await_text("Stop Watch  Stopped")
         h.await_text("yellow")
+
+
+@pytest.fixture
+def clock_server(tmp_path):
+    path = str(tmp_path / "ct_clock.sock")
+    server = subprocess.Popen(ct_clock_run("--test_mode", "--test_time", "12:34:56",
+                                           "serve", "--socket", path))
+    for _ in range(50):
+        if os.path.exists(path):
+            break
+        sleep(0.1)
+    yield path
+    server.terminate()
+    server.wait()
+
+
+def test_ct_clock_attach_viewers(clock_server):
+    attach = ct_clock_run("attach", "--socket", clock_server)
+    with Runner(*attach, width=100, height=26) as h1, \
+            Runner(*attach, width=100, height=26) as h2:
+        h1.default_timeout = h2.default_timeout = 3
+        h1.await_text("test mode")
+        h2.await_text("test mode")
+        assert "PM" in h1.screenshot()
+        h1.write("q")
+        h1.await_exit()
+        h2.await_text("test mode")
+
+
+def test_ct_clock_serve_drops_viewer_without_newline(clock_server):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as viewer:
+        viewer.connect(clock_server)
+        viewer.settimeout(3)
+        with contextlib.suppress(OSError):
+            for _ in range(100):
+                viewer.sendall(b"9" * 1024)
+        try:
+            dropped = viewer.recv(1024) == b""
+        except ConnectionResetError:
+            dropped = True  # closed with unread data
+        assert dropped
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as viewer:
+        viewer.connect(clock_server)  # the server is still running
+        viewer.settimeout(3)
+        viewer.sendall(b"26 100\n")
+        assert viewer.recv(1024).startswith(b"\x1b[0m")
+
+
+def test_ct_clock_attach_ignores_special_keys(clock_server):
+    with Runner(*ct_clock_run("attach", "--socket", clock_server), width=100,
+                height=26) as h:
+        h.default_timeout = 3
+        h.await_text("test mode")
+        h.press("F2")  # ESC O Q
+        h.press("Up")
+        sleep(0.5)
+        assert "test mode" in h.screenshot()
+        h.press("q")
+        h.await_exit()
+
+
+def test_ct_clock_attach_no_server(tmp_path):
+    path = str(tmp_path / "missing.sock")
+    command = " ".join(ct_clock_run("attach", "--socket", path))
+    with Runner("bash", "-c", f"{command}; sleep 5") as h:
+        h.default_timeout = 2
+        h.await_text("No clock server running on")
+        assert "Traceback" not in h.screenshot()
+
+
+def test_ct_clock_ansi_test_mode_time():
+    with Runner(*ct_clock_run("--ansi", "--test_mode", "--test_time", "12:34:56")) as h:
+        h.default_timeout = 3
+        h.await_text("test mode")
+        sc = h.screenshot()
+        assert "1" in sc
+        assert "6" in sc
+        assert "9" not in sc
+        h.press("q")
+        h.await_exit()
+
+
+def test_ct_clock_ansi_stopwatch_pause():
+    with Runner(*ct_clock_run("--ansi", "--test_mode", "stop_watch")) as h:
+        h.default_timeout = 3
+        h.await_text("Stop Watch  Stopped")
+        h.press("g")
+        h.await_text("Stop Watch  Running")
+        h.press("g")
+        h.await_text("Stop Watch  Paused")
+        h.press("q")
+        h.await_exit()
+
+
+def test_ct_clock_ansi_dashboard():
+    command = ct_clock_run("--ansi", "--test_mode", "dashboard", "UTC", "Asia/Tokyo")
+    with Runner(*command, width=160, height=30) as h:
+        h.default_timeout = 3
+        h.await_text("Asia/Tokyo")
+        h.press("q")
+        h.await_exit()
+
+
+@pytest.mark.parametrize("command, expected", [
+    ((), b"test mode"), (("stop_watch",), b"Stop Watch  Stopped"),
+    (("timer", "tea=1m"), b"tea  Stopped"), (("dashboard", "UTC"), b"UTC"),
+])
+def test_ct_clock_ansi_without_terminal(command, expected):
+    # output only, Ctrl-C quits without a traceback
+    env = dict(os.environ, COLUMNS="100", LINES="26")
+    with subprocess.Popen(ct_clock_run("--ansi", "--test_mode", *command),
+                          stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, env=env) as clock:
+        sleep(1.5)
+        clock.send_signal(signal.SIGINT)
+        out, err = clock.communicate(timeout=3)
+    assert clock.returncode == 0 and err == b""
+    assert expected in out
+
+
+def test_ct_clock_timer_expires():
+    with Runner(*ct_clock_run("--test_mode", "timer", "tea=2s", "egg=1h")) as h:
+        h.default_timeout = 3
+        h.await_text("tea  Stopped")
+        h.await_text("egg                   01:00:00  Stopped")
+        h.press("g")
+        h.await_text("tea  Running")
+        h.await_text("tea  Done")
+        h.press("n")
+        h.await_text("egg  Stopped")
+        h.await_text("tea                   00:00:00  Done")
+        h.press("q")
+        h.await_exit()